@@ -1,9 +1,18 @@
 import logging
 from aiogram import Bot, Dispatcher, executor
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.types import BotCommand, ParseMode
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
-from config import TOKEN, COMMANDS
+from config import TOKEN, COMMANDS, DATABASE_URL, CATALOG_NOTIFY, FSM_STORAGE, \
+    FSM_STORAGE_URL, FSM_FLUSH_INTERVAL, FSM_STATE_TTL, BOT_MODE, WEBHOOK_URL, \
+    WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_WORKERS, \
+    WEBHOOK_QUEUE_SIZE, WEBHOOK_DRAIN_TIMEOUT, WEBAPP_HOST, WEBAPP_PORT, TELEGRAM_API_URL, \
+    BOT_RATE_LIMIT, BOT_CHAT_RATE_LIMIT, BOT_GROUP_RATE_LIMIT, BOT_MAX_RETRIES, \
+    THROTTLE_RATE, THROTTLE_WINDOW, SINGLE_FLIGHT_CALLBACKS
 from handlers import HandlerMain
+from database import DBEngine, DBManager, CatalogListener, SQLAlchemyStorage, CartBuffer
+from middlewares import UnitOfWorkMiddleware, ThrottlingMiddleware
+from transport import WebhookServer, ThrottledBot
 
 
 class AioBot:
@@ -14,15 +23,47 @@ class AioBot:
 
     def __init__(self) -> None:
         self.token = TOKEN
-        self.bot = Bot(self.token, parse_mode=ParseMode.HTML)
-        self.storage = MemoryStorage()
+        self.bot = ThrottledBot(
+            self.token, parse_mode=ParseMode.HTML,
+            rate=BOT_RATE_LIMIT, chat_rate=BOT_CHAT_RATE_LIMIT,
+            group_rate=BOT_GROUP_RATE_LIMIT, max_retries=BOT_MAX_RETRIES,
+            server=TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL
+            else TELEGRAM_PRODUCTION
+        )
+        self.storage = SQLAlchemyStorage(
+            FSM_STORAGE_URL, flush_interval=FSM_FLUSH_INTERVAL, state_ttl=FSM_STATE_TTL
+        ) if FSM_STORAGE == 'sql' else MemoryStorage()
         self.dp = Dispatcher(self.bot, storage=self.storage)
+        self.throttling = ThrottlingMiddleware(
+            THROTTLE_RATE, THROTTLE_WINDOW, single_flight=SINGLE_FLIGHT_CALLBACKS
+        )
+        self.dp.middleware.setup(self.throttling)
+        self.dp.middleware.setup(UnitOfWorkMiddleware())
         self.handler = HandlerMain(self.bot, self.dp)
+        self.catalog_listener = CatalogListener(
+            DATABASE_URL, DBManager().invalidate_catalog
+        ) if CATALOG_NOTIFY else None
 
     async def on_startup(self, _):
+        if self.catalog_listener is not None:
+            await self.catalog_listener.start()
+        if BOT_MODE == 'webhook' and WEBHOOK_URL:
+            await self.bot.set_webhook(
+                WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_MAX_CONNECTIONS
+            )
         logging.info('Бот в работе')
         await self.set_main_menu(self.bot)
 
+    async def on_shutdown(self, _):
+        if self.catalog_listener is not None:
+            await self.catalog_listener.stop()
+        await CartBuffer().close()
+        await self.bot.shutdown()
+        await DBEngine().dispose()
+        logging.info(f'Отклонено апдейтов: {dict(self.throttling.rejected)}')
+        logging.info('Бот остановлен')
+
     async def set_main_menu(self, bot: Bot):
         main_menu_commands = [BotCommand(
             command=command,
@@ -39,10 +80,16 @@ class AioBot:
         """Метод запускает основные события сервера"""
         self.start()
 
-        executor.start_polling(
-            dispatcher=self.dp, on_startup=self.on_startup,
-            skip_updates=True
-        )
+        if BOT_MODE == 'webhook':
+            WebhookServer(
+                self.dp, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET, workers=WEBHOOK_WORKERS,
+                queue_size=WEBHOOK_QUEUE_SIZE, drain_timeout=WEBHOOK_DRAIN_TIMEOUT
+            ).run(WEBAPP_HOST, WEBAPP_PORT, on_startup=self.on_startup, on_shutdown=self.on_shutdown)
+        else:
+            executor.start_polling(
+                dispatcher=self.dp, on_startup=self.on_startup,
+                on_shutdown=self.on_shutdown, skip_updates=True
+            )
 
 
 if __name__ == '__main__':
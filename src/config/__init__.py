@@ -1,3 +1,3 @@
 from .config import *
 from .lexicon import *
-from .utils import Utils
\ No newline at end of file
+from .utils import Utils, parse_money, format_money
\ No newline at end of file
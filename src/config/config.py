@@ -13,4 +13,77 @@ TOKEN = os.getenv('TOKEN')
 TOKEN_PAY = os.getenv('TOKEN_PAY')
 IS_ADMIN_ID = os.getenv('IS_ADMIN_ID')
 
-DATABASE_URL = f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
\ No newline at end of file
+DATABASE_URL = os.getenv(
+    'DATABASE_URL',
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+)
+
+# настройки движка и пула соединений с бд
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() == 'true'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# настройки драйвера asyncpg
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+DB_COMMAND_TIMEOUT = float(os.getenv('DB_COMMAND_TIMEOUT', 30))
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 15000))  # мс
+
+# кэш каталога (категории и товары)
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', 60))  # сек
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 512))
+# количество кнопок категорий и товаров на странице меню
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 8))
+# инвалидация кэша между процессами через PostgreSQL LISTEN/NOTIFY
+CATALOG_NOTIFY = os.getenv('CATALOG_NOTIFY', 'false').lower() == 'true'
+
+# задержка записи в бд изменений количества товара в заказе (кнопки 🔼/🔽):
+# изменения за серию нажатий записываются одним запросом, 0 - запись сразу
+ORDER_FLUSH_DELAY = float(os.getenv('ORDER_FLUSH_DELAY', 0.7))  # сек
+
+# inline-поиск товаров: число результатов и время кэширования
+# ответа на одинаковый запрос (в боте и на стороне Telegram)
+SEARCH_RESULTS_LIMIT = min(int(os.getenv('SEARCH_RESULTS_LIMIT', 20)), 50)
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 30))  # сек
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 1024))
+
+# импорт и экспорт каталога: число товаров в одном запросе к бд
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+# синхронизация остатков со складом: число строк в одной пачке (COPY + UPDATE)
+STOCK_SYNC_BATCH_SIZE = int(os.getenv('STOCK_SYNC_BATCH_SIZE', 5000))
+
+# хранилище FSM: memory - в памяти процесса, sql - в бд (FSM_STORAGE_URL)
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'memory')
+FSM_STORAGE_URL = os.getenv('FSM_STORAGE_URL', DATABASE_URL)
+FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', 0.2))  # сек, 0 - запись сразу
+FSM_STATE_TTL = float(os.getenv('FSM_STATE_TTL', 86400))  # сек
+
+# адрес Bot API (свой сервер Bot API либо transport.fake_bot_api), по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# лимиты исходящих запросов к Bot API: в секунду на бота, на личный чат и на группу
+BOT_RATE_LIMIT = float(os.getenv('BOT_RATE_LIMIT', 30))
+BOT_CHAT_RATE_LIMIT = float(os.getenv('BOT_CHAT_RATE_LIMIT', 1))
+BOT_GROUP_RATE_LIMIT = float(os.getenv('BOT_GROUP_RATE_LIMIT', 20 / 60))
+# сколько раз повторять запрос после ответа 429 (retry_after)
+BOT_MAX_RETRIES = int(os.getenv('BOT_MAX_RETRIES', 3))
+
+# ограничение частоты апдейтов от одного пользователя: не больше
+# THROTTLE_RATE сообщений и callback за THROTTLE_WINDOW секунд
+THROTTLE_RATE = int(os.getenv('THROTTLE_RATE', 5))
+THROTTLE_WINDOW = float(os.getenv('THROTTLE_WINDOW', 1))  # сек
+# callback, которые не обрабатываются повторно, пока идет обработка предыдущего нажатия
+SINGLE_FLIGHT_CALLBACKS = ('post',)
+
+# режим получения апдейтов: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# публичный адрес webhook, если не задан - webhook в Telegram не регистрируется
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 16))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', 30))  # сек
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', 8080))
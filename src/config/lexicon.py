@@ -1,7 +1,5 @@
 from emoji import emojize
 
-COUNT = 0
-
 # кнопки управления
 KEYBOARD: dict[str, str] = {
     'CHOOSE_GOODS': emojize(':open_file_folder: Выбрать товар'),
@@ -14,11 +12,11 @@ KEYBOARD: dict[str, str] = {
     '>>': emojize('⏩'),
     'BACK_STEP': emojize('◀️'),
     'NEXT_STEP': emojize('▶️'),
+    'PREV_PAGE': emojize('⬅️'),
+    'NEXT_PAGE': emojize('➡️'),
     'ORDER': emojize('✅ ЗАКАЗ'),
     'X': emojize('❌'),
     'DOWN': emojize('🔽'),
-    'AMOUNT_PRODUCT': COUNT,
-    'AMOUNT_ORDERS': COUNT,
     'UP': emojize('🔼'),
     'APPLY': '✅ Оформить заказ',
     'BUY': emojize('✅ Оплатить картой'),
@@ -33,7 +31,10 @@ KEYBOARD: dict[str, str] = {
     'LIST_PRODUCT': emojize('📋 Список товаров'),
     'SAVE_PRODUCT': emojize('✅ Сохранить'),
     'DELETE_PRODUCT': emojize('❌ Удалить товар'),
-    'CANCEL': emojize('❌ Отменить')
+    'CANCEL': emojize('❌ Отменить'),
+    'ADD_TO_ORDER': emojize('🛒 Добавить в заказ'),
+    'IMPORT_CATALOG': emojize('📥 Импорт каталога'),
+    'EXPORT_CATALOG': emojize('📤 Экспорт каталога')
 }
 
 
@@ -113,6 +114,24 @@ Cтоимость: {price} uah
 На складе осталось {quantity} ед. 
 """
 
+# ответ пользователю, если товара на складе не осталось
+out_of_stock = 'К сожалению, этого товара на складе не осталось 🤷'
+
+# ответ пользователю, если в позиции заказа осталась одна единица товара
+min_order_quantity = 'В заказе осталась одна единица, чтобы убрать товар нажмите ❌'
+
+# товар, выбранный в результатах inline-поиска
+search_result = """
+<b>{name}</b>
+<i>{title}</i>
+
+Cтоимость: {price} uah
+На складе: {quantity} ед.
+"""
+
+# описание товара в списке результатов inline-поиска
+search_description = '{title} · {price} uah'
+
 # ответ пользователю при посещении блока с заказом
 order = """
 <b>Позиция в заказе № </b> <i>{}</i>
@@ -164,6 +183,8 @@ view_category = """
 """
 delete_category = 'Категория, успешно удалена!'
 delete_category_failed = 'Ошибка удаления категории!'
+# категорию удалили, пока у пользователя была открыта старая клавиатура
+category_not_found = 'Категория не найдена, возможно, она была удалена'
 
 # ********** Ответы в разделе продукты **********
 add_product = ''
@@ -183,6 +204,30 @@ failed_to_save_product = '{}, возникла ошибка при добавл
 delete_product = 'Товар, успешно удален с бд!'
 delete_product_failed = 'Ошибка удаления товара!'
 
+# ********** Импорт и экспорт каталога **********
+import_catalog = """
+{}, пришли файл каталога CSV или XLSX с колонками:
+<code>category, name, title, price, quantity</code>
+Товары с тем же названием в категории будут обновлены, новые - добавлены
+"""
+import_wrong_file = '{}, нужен файл CSV или XLSX'
+import_progress = """
+<b>Импорт каталога...</b>
+Строк обработано: {rows}
+Добавлено: {created}, обновлено: {updated}, с ошибками: {failed}
+"""
+import_done = """
+<b>Импорт каталога завершен</b>
+Строк обработано: {rows}
+Добавлено: {created}, обновлено: {updated}, с ошибками: {failed}
+{errors}"""
+import_error = 'Строка {line}: {error}\n'
+import_failed = 'Не удалось прочитать файл каталога: {}'
+export_catalog = 'Каталог: {} товаров'
+
+# ********** Ограничение частоты запросов **********
+too_many_requests = 'Слишком много нажатий, подождите немного ⏳'
+
 
 MESSAGES: dict[str, str] = {
     'start': start,
@@ -197,6 +242,7 @@ MESSAGES: dict[str, str] = {
     'view_category': view_category,
     'delete_category': delete_category,
     'delete_category_failed': delete_category_failed,
+    'category_not_found': category_not_found,
     'select_category': select_category,
     'write_name': write_name,
     'write_title': write_title,
@@ -208,9 +254,21 @@ MESSAGES: dict[str, str] = {
     'delete_product_failed': delete_product_failed,
     'trading_store': trading_store,
     'product_order': product_order,
+    'out_of_stock': out_of_stock,
+    'min_order_quantity': min_order_quantity,
+    'search_result': search_result,
+    'search_description': search_description,
     'order': order,
     'no_orders': no_orders,
     'apply': apply,
     'select_payments': select_payments,
-    'settings': settings
+    'settings': settings,
+    'too_many_requests': too_many_requests,
+    'import_catalog': import_catalog,
+    'import_wrong_file': import_wrong_file,
+    'import_progress': import_progress,
+    'import_done': import_done,
+    'import_error': import_error,
+    'import_failed': import_failed,
+    'export_catalog': export_catalog
 }
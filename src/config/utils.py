@@ -1,4 +1,23 @@
 import abc
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+
+
+def parse_money(text: str) -> Decimal:
+    """Переводит введенную сумму ('12,5' или '12.50') в Decimal с точностью до копейки"""
+    try:
+        value = Decimal(str(text).strip().replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        raise ValueError(f'invalid amount: {text!r}')
+    if not value.is_finite() or value < 0:
+        raise ValueError(f'invalid amount: {text!r}')
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def format_money(value: Decimal) -> str:
+    """Форматирует сумму для сообщений: 1 234 567.50"""
+    return f'{value:,.2f}'.replace(',', ' ')
 
 
 class Total(metaclass=abc.ABCMeta):
@@ -20,11 +39,11 @@ class Utils(Total):
     def __init__(self, DB):
         super().__init__(DB)
 
-    async def total_coast(self, list_quantity: list, list_price: list) -> int:
-        """Считает общую сумму заказа и возвращает результат"""
+    async def total_coast(self, list_quantity: list, list_price: list) -> Decimal:
+        """Считает общую сумму заказа (точно, в Decimal) и возвращает результат"""
 
-        result = sum(list_quantity[index] * list_price[index]
-                     for index, _ in enumerate(list_price))
+        result = sum((list_quantity[index] * list_price[index]
+                      for index, _ in enumerate(list_price)), Decimal(0))
         return result
 
     async def total_quantity(self, list_quantity: list) -> int:
@@ -34,25 +53,10 @@ class Utils(Total):
 
         return quantity_finish
 
-    async def get_total_coast(self) -> int:
-        """Возвращает общую стоимость товара"""
-
-        all_product_id = await self.DB.select_all_product_id()
-        all_product = [await self.DB.get_product(product) for product in all_product_id]
-        all_product_price = [product.price for product in all_product]
-
-        all_quantity = [
-            await self.DB.select_order_quantity(product) for product in all_product_id
-        ]
-
-        return await self.total_coast(all_quantity, all_product_price)
-
-    async def get_total_quantity(self) -> int:
-        """Возвращает общее количество заказанной единицы товара"""
-
-        all_product_id = await self.DB.select_all_product_id()
-        all_quantity = [
-            await self.DB.select_order_quantity(product) for product in all_product_id
-        ]
-        return await self.total_quantity(all_quantity)
+    async def get_totals(self, user_id: int) -> tuple[Decimal, int]:
+        """
+        Возвращает общую стоимость и общее количество
+        заказанной единицы товара за один запрос к бд
+        """
 
+        return await self.DB.select_order_totals(user_id)
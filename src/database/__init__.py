@@ -1 +1,7 @@
-from .dbalchemy import DBManager
+from .dbalchemy import DBManager, DBEngine, Page
+from .unit_of_work import UnitOfWork, commit_unit_of_work, current_unit_of_work
+from .cache import CatalogCache, CatalogListener
+from .fsm_storage import SQLAlchemyStorage
+from .cart_buffer import CartBuffer
+from .catalog_io import ImportReport, import_catalog, export_catalog
+from .stock_sync import StockRow, SyncReport, read_stock, sync_stock
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+
+class CatalogCache:
+    """
+    Кэш каталога (категории и товары) в памяти процесса.
+    Записи живут не дольше ttl секунд, при переполнении
+    вытесняются давно не использованные (LRU)
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # версия каталога, увеличивается при каждой инвалидации
+        self.version = 0
+        self.__data: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение по ключу либо default, если его нет или оно устарело"""
+        item = self.__data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.__data[key]
+            return default
+
+        self.__data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """
+        Сохраняет значение. version - версия каталога на момент начала загрузки:
+        если кэш с тех пор сбрасывался, значение устарело и не сохраняется
+        """
+        if version is not None and version != self.version:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        self.__data[key] = (expires_at, value)
+        self.__data.move_to_end(key)
+
+        while len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Сбрасывает весь кэш и увеличивает версию каталога"""
+        self.__data.clear()
+        self.version += 1
+
+
+class CatalogListener:
+    """
+    Слушает канал PostgreSQL LISTEN/NOTIFY, в который DBManager публикует
+    изменения каталога, чтобы кэши нескольких процессов бота оставались согласованными
+    """
+
+    CHANNEL = 'catalog_changed'
+
+    def __init__(self, url: str, on_change: Callable[[], None], reconnect_delay: float = 5,
+                 max_reconnect_delay: float = 60):
+        # asyncpg принимает dsn без имени драйвера sqlalchemy
+        self.dsn = make_url(url).set(drivername='postgresql').render_as_string(hide_password=False)
+        self.on_change = on_change
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.__connection: Optional[asyncpg.Connection] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__stopped = asyncio.Event()
+
+    def __notify(self, connection, pid, channel, payload) -> None:
+        self.on_change()
+
+    def __terminated(self, connection) -> None:
+        # пока соединения нет, уведомления теряются: сбрасываем кэш сразу
+        self.on_change()
+
+    async def __listen(self) -> None:
+        delay = self.reconnect_delay
+        while not self.__stopped.is_set():
+            try:
+                self.__connection = await asyncpg.connect(self.dsn)
+                self.__connection.add_termination_listener(self.__terminated)
+                await self.__connection.add_listener(self.CHANNEL, self.__notify)
+                # изменения, пропущенные до подписки
+                self.on_change()
+                delay = self.reconnect_delay
+
+                while not self.__connection.is_closed() and not self.__stopped.is_set():
+                    with suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self.__stopped.wait(), self.reconnect_delay)
+            except Exception:
+                # любая ошибка (в том числе asyncpg.InterfaceError) не должна
+                # останавливать слушателя: иначе кэши процессов разойдутся
+                logging.exception(f'catalog listener failed, reconnect in {delay:.1f} s')
+                # без соединения уведомления теряются
+                self.on_change()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.__stopped.wait(), delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                if self.__connection is not None and not self.__connection.is_closed():
+                    with suppress(Exception):
+                        await self.__connection.close()
+                self.__connection = None
+
+    async def start(self) -> None:
+        self.__stopped.clear()
+        self.__task = asyncio.create_task(self.__listen())
+
+    async def stop(self) -> None:
+        self.__stopped.set()
+        if self.__task is not None:
+            await self.__task
+            self.__task = None
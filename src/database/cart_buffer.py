@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from src.config import ORDER_FLUSH_DELAY
+from .dbalchemy import DBManager, Singleton
+from .unit_of_work import current_unit_of_work
+
+Key = tuple[int, int]
+Render = Callable[[int], Awaitable]
+
+
+class CartEntry:
+    """Позиция заказа с изменением количества, ещё не записанным в бд"""
+
+    __slots__ = ('order', 'stock', 'delta', 'flushing', 'deadline', 'task', 'render',
+                 'rendered', 'lock')
+
+    def __init__(self, order: int, stock: int):
+        # количество в заказе и остаток на складе по данным бд
+        self.order = order
+        self.stock = stock
+        # изменение количества, ожидающее записи, и изменение, которое пишется сейчас
+        self.delta = 0
+        self.flushing = 0
+        self.deadline = 0.0
+        self.task: Optional[asyncio.Task] = None
+        # последняя функция отрисовки заказа и количество, которое уже показано
+        self.render: Optional[Render] = None
+        self.rendered: Optional[int] = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def quantity(self) -> int:
+        return self.order + self.flushing + self.delta
+
+    @property
+    def pending(self) -> int:
+        """Изменение количества, ещё не отраженное в order и stock"""
+        return self.flushing + self.delta
+
+
+class CartBuffer(metaclass=Singleton):
+    """
+    Отложенная запись изменений количества товара в заказе.
+    Нажатия 🔼/🔽 меняют количество в памяти, суммарное изменение
+    по позиции (пользователь, товар) записывается в бд одним запросом,
+    когда нажатия прекращаются на delay секунд, либо сразу по flush
+    (оформление заказа, переход к другой позиции).
+
+    Сообщение с заказом обновляется при первом нажатии серии и один раз
+    после записи в бд, если показанное количество отличается от итогового
+    """
+
+    def __init__(self, delay: float = ORDER_FLUSH_DELAY):
+        self.delay = delay
+        self.__db = DBManager()
+        self.__entries: dict[Key, CartEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    async def __entry(self, key: Key) -> Optional[CartEntry]:
+        entry = self.__entries.get(key)
+        if entry is None:
+            order = await self.__db.select_order_quantity(*key)
+            if order is None:
+                return None
+            stock = await self.__db.select_product_quantity(key[1])
+            entry = self.__entries.setdefault(key, CartEntry(order, stock))
+        return entry
+
+    async def adjust(self, user_id: int, product_id: int, delta: int,
+                     render: Render) -> Optional[int]:
+        """
+        Меняет количество товара в заказе на delta и возвращает новое
+        количество либо None, если в позиции должна остаться хотя бы
+        одна единица, товара на складе недостаточно или позиции нет.
+        render(quantity) отрисовывает заказ
+        """
+        key = (user_id, product_id)
+        entry = await self.__entry(key)
+        if entry is None:
+            return None
+
+        quantity = entry.quantity + delta
+        if quantity < 1 or entry.pending + delta > entry.stock:
+            return None
+
+        entry.delta += delta
+        entry.render = render
+
+        if self.delay <= 0:
+            await self.__flush_entry(key, entry)
+            return quantity
+
+        leading = entry.rendered is None
+        if leading:
+            entry.rendered = quantity
+
+        entry.deadline = asyncio.get_running_loop().time() + self.delay
+        if entry.task is None:
+            entry.task = asyncio.create_task(self.__flush_later(key, entry))
+
+        if leading:
+            await render(quantity)
+        return quantity
+
+    async def __flush_later(self, key: Key, entry: CartEntry) -> None:
+        # запись идет в своей транзакции, а не в транзакции апдейта, создавшего задачу
+        current_unit_of_work.set(None)
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                while (wait := entry.deadline - loop.time()) > 0:
+                    await asyncio.sleep(wait)
+                await self.__flush_entry(key, entry)
+                if not entry.delta:
+                    break
+        except Exception:
+            # изменения остались в буфере и будут записаны следующим flush
+            logging.exception(f'failed to flush order {key}, pending delta {entry.delta}')
+        finally:
+            entry.task = None
+
+    async def __flush_entry(self, key: Key, entry: CartEntry) -> None:
+        """Записывает накопленное изменение позиции одним запросом и обновляет сообщение"""
+        async with entry.lock:
+            delta, entry.delta = entry.delta, 0
+            entry.flushing = delta
+
+            try:
+                moved = None
+                if delta > 0:
+                    moved = await self.__db.increase_order(*key, delta)
+                    if moved is None:
+                        # остаток успели списать другие заказы, резервируем сколько есть
+                        available = await self.__db.select_product_quantity(key[1])
+                        if available > 0:
+                            moved = await self.__db.increase_order(*key, min(delta, available))
+                elif delta < 0:
+                    moved = await self.__db.decrease_order(*key, -delta)
+
+                if moved is None and delta:
+                    order = await self.__db.select_order_quantity(*key)
+                    if order is None:
+                        # позицию удалили, пока изменения ждали записи
+                        self.__discard(key, entry)
+                        return
+                    moved = order, await self.__db.select_product_quantity(key[1])
+            except Exception:
+                # в бд ничего не записано: изменение возвращается в буфер,
+                # а следующее нажатие заново отрисует заказ
+                entry.delta += delta
+                entry.rendered = None
+                raise
+            finally:
+                entry.flushing = 0
+
+            if moved is not None:
+                entry.order, entry.stock = moved
+
+            if entry.delta:
+                return
+            self.__discard(key, entry)
+
+            if entry.render is not None and entry.rendered != entry.order:
+                entry.rendered = entry.order
+                await entry.render(entry.order)
+
+    def __discard(self, key: Key, entry: CartEntry) -> None:
+        if self.__entries.get(key) is entry:
+            del self.__entries[key]
+
+    async def flush(self, user_id: Optional[int] = None) -> None:
+        """
+        Записывает изменения заказа пользователя (всех пользователей,
+        если user_id не указан) без обновления сообщений: обработчик,
+        вызвавший flush, сам покажет актуальные данные
+        """
+        token = current_unit_of_work.set(None)
+        try:
+            for key, entry in list(self.__entries.items()):
+                if user_id is None or key[0] == user_id:
+                    entry.render = None
+                    await self.__flush_entry(key, entry)
+        finally:
+            current_unit_of_work.reset(token)
+
+    async def close(self) -> None:
+        await self.flush()
@@ -0,0 +1,265 @@
+"""
+Импорт и экспорт каталога товаров в файлах CSV и XLSX.
+
+Файл читается построчно, строки проверяются и загружаются в бд пачками
+по IMPORT_BATCH_SIZE (DBManager.import_catalog), каждая пачка в своей
+транзакции. Колонки: category, name, title, price, quantity.
+Товар определяется категорией и названием: существующий обновляется,
+новый добавляется. Экспорт выгружает каталог в CSV с теми же колонками.
+
+    python -m src.database.catalog_io import prices.csv
+    python -m src.database.catalog_io export catalog.csv
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sys
+import zipfile
+from xml.etree.ElementTree import ParseError
+from decimal import Decimal
+from typing import Awaitable, Callable, Iterator, NamedTuple, Optional, TextIO
+
+from src.config import IMPORT_BATCH_SIZE, parse_money
+from .dbalchemy import DBManager, DBEngine
+from .unit_of_work import current_unit_of_work
+
+COLUMNS = ('category', 'name', 'title', 'price', 'quantity')
+MAX_LENGTH = 255
+MAX_PRICE = Decimal('9999999999.99')
+# предел колонки integer в PostgreSQL
+MAX_INTEGER = 2 ** 31 - 1
+# сколько ошибок в строках сохраняется для отчета
+MAX_ERRORS = 20
+
+
+class CatalogRow(NamedTuple):
+    """Проверенная строка каталога"""
+    category: str
+    name: str
+    title: str
+    price: Decimal
+    quantity: int
+
+
+class ImportReport:
+    """Итоги загрузки каталога"""
+
+    __slots__ = ('rows', 'created', 'updated', 'failed', 'errors')
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        # первые MAX_ERRORS ошибок: (номер строки, описание)
+        self.errors: list[tuple[int, str]] = []
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+Progress = Callable[[ImportReport], Awaitable]
+
+
+# ********** READERS **********
+
+def _header(columns, required: tuple) -> list[str]:
+    header = [str(column or '').strip().lower() for column in columns]
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f'missing columns: {", ".join(missing)}')
+    return header
+
+
+def read_csv(path: str, required: tuple = COLUMNS) -> Iterator[tuple[int, dict]]:
+    """Строки CSV (номер строки, значения по колонкам); разделитель , ; или табуляция"""
+    # utf-8-sig - файлы из Excel начинаются с BOM
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        try:
+            dialect = csv.Sniffer().sniff(file.read(4096), delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        file.seek(0)
+
+        reader = csv.reader(file, dialect)
+        try:
+            header = _header(next(reader, ()), required)
+            for values in reader:
+                if any(value.strip() for value in values):
+                    yield reader.line_num, dict(zip(header, values))
+        except csv.Error as e:
+            # NUL в файле, слишком длинное поле и т.п.
+            raise ValueError(f'invalid CSV file, line {reader.line_num}: {e}')
+
+
+def read_xlsx(path: str, required: tuple = COLUMNS) -> Iterator[tuple[int, dict]]:
+    """Строки первого листа XLSX (номер строки, значения по колонкам)"""
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError('XLSX import requires openpyxl (pip install openpyxl)')
+
+    try:
+        # read_only - лист читается потоком, а не загружается целиком
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = _header(next(rows, ()), required)
+            for line, values in enumerate(rows, start=2):
+                if any(value is not None and str(value).strip() for value in values):
+                    yield line, dict(zip(header, values))
+        finally:
+            workbook.close()
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ParseError) as e:
+        # поврежденный архив, переименованный файл другого формата, битый XML листа
+        raise ValueError(f'invalid XLSX file: {e}')
+
+
+def read_rows(path: str, required: tuple = COLUMNS) -> Iterator[tuple[int, dict]]:
+    """
+    Строки файла CSV или XLSX (формат по расширению), required - обязательные
+    колонки. ValueError - формат не поддерживается или колонок не хватает
+    """
+    match os.path.splitext(path)[1].lower():
+        case '.csv':
+            return read_csv(path, required)
+        case '.xlsx':
+            return read_xlsx(path, required)
+        case extension:
+            raise ValueError(f'unsupported file type: {extension or path}')
+
+
+def parse_row(record: dict) -> CatalogRow:
+    """Проверяет строку файла, ValueError - строка с ошибкой"""
+    text = {}
+    for column in ('category', 'name', 'title'):
+        value = str(record.get(column) or '').strip()
+        if len(value) > MAX_LENGTH:
+            raise ValueError(f'{column} is longer than {MAX_LENGTH} characters')
+        text[column] = value
+    if not text['category'] or not text['name']:
+        raise ValueError('category and name are required')
+
+    price = parse_money(record.get('price'))
+    if price > MAX_PRICE:
+        raise ValueError(f'price is too large: {price}')
+
+    return CatalogRow(text['category'], text['name'], text['title'] or text['name'],
+                      price, parse_count(record.get('quantity'), 'quantity'))
+
+
+def parse_count(value, column: str) -> int:
+    """Целое неотрицательное число из ячейки файла, ValueError - неверное значение"""
+    try:
+        # из XLSX числа приходят как float: 10.0
+        number = Decimal(str(value).strip())
+        if number != number.to_integral_value() or not 0 <= number <= MAX_INTEGER:
+            raise ValueError
+    except (ArithmeticError, ValueError):
+        raise ValueError(f'invalid {column}: {value!r}')
+    return int(number)
+
+
+# ********** IMPORT / EXPORT **********
+
+async def import_catalog(path: str, progress: Optional[Progress] = None,
+                         batch_size: int = IMPORT_BATCH_SIZE) -> ImportReport:
+    """
+    Загружает каталог из файла. progress(report) вызывается после каждой
+    пачки. ValueError - файл не удалось прочитать (формат, колонки)
+    """
+    db = DBManager()
+    report = ImportReport()
+    # повтор товара в пачке заменяет предыдущую строку: ON CONFLICT не обновляет строку дважды
+    batch: dict[tuple[str, str], CatalogRow] = {}
+
+    async def flush() -> None:
+        created, updated = await db.import_catalog(list(batch.values()))
+        report.created += created
+        report.updated += updated
+        batch.clear()
+        if progress is not None:
+            await progress(report)
+
+    # пачки фиксируются сразу, а не в транзакции апдейта, из которого запущен импорт
+    token = current_unit_of_work.set(None)
+    try:
+        for line, record in read_rows(path):
+            report.rows += 1
+            try:
+                row = parse_row(record)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+
+            batch[row.category, row.name] = row
+            if len(batch) >= batch_size:
+                await flush()
+
+        if batch:
+            await flush()
+    finally:
+        current_unit_of_work.reset(token)
+    return report
+
+
+async def export_catalog(file: TextIO, batch_size: int = IMPORT_BATCH_SIZE) -> int:
+    """Записывает каталог в CSV, возвращает число товаров"""
+    writer = csv.writer(file)
+    writer.writerow(COLUMNS)
+
+    count = 0
+    token = current_unit_of_work.set(None)
+    try:
+        async for rows in DBManager().export_catalog(batch_size):
+            writer.writerows(rows)
+            count += len(rows)
+    finally:
+        current_unit_of_work.reset(token)
+    return count
+
+
+def main() -> None:
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description='Catalog import/export')
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('path')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        try:
+            if args.command == 'import':
+                async def progress(report: ImportReport) -> None:
+                    logging.info(f'Строк: {report.rows}, добавлено: {report.created}, '
+                                 f'обновлено: {report.updated}, с ошибками: {report.failed}')
+
+                report = await import_catalog(args.path, progress, args.batch_size)
+                await progress(report)
+                for line, message in report.errors:
+                    logging.warning(f'Строка {line}: {message}')
+            else:
+                with open(args.path, 'w', newline='', encoding='utf-8') as file:
+                    count = await export_catalog(file, args.batch_size)
+                logging.info(f'Выгружено товаров: {count}')
+        finally:
+            await DBEngine().dispose()
+
+    try:
+        asyncio.run(run())
+    except ValueError as e:
+        logging.error(f'Не удалось прочитать файл: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
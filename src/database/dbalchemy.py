@@ -1,25 +1,64 @@
 import array as arr
 from datetime import datetime
+from decimal import Decimal
 from functools import wraps
-from typing import List
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, List, NamedTuple, Optional
 from sqlalchemy.ext.asyncio import create_async_engine, \
-    async_sessionmaker, AsyncSession
-from sqlalchemy import insert, select, func, delete, update
-from src.config import DATABASE_URL
+    async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy import insert, select, func, delete, update, literal, literal_column, or_, text, \
+    exists, cast, Table, Column, MetaData, Integer, String
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.dialects.postgresql import distinct_on, insert as pg_insert
+from sqlalchemy.engine import make_url
+from src.config import DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, \
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, \
+    DB_COMMAND_TIMEOUT, DB_STATEMENT_TIMEOUT, CATALOG_CACHE_TTL, CATALOG_CACHE_SIZE, \
+    CATALOG_NOTIFY, CATALOG_PAGE_SIZE, SEARCH_RESULTS_LIMIT, SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, \
+    IMPORT_BATCH_SIZE
 from src.database.tables import Category, Product, Order
+from .unit_of_work import current_unit_of_work
+from .cache import CatalogCache, CatalogListener
+from .search import TrigramIndex
+
+_MISSING = object()
+
+# временная таблица синхронизации остатков, живет до конца транзакции
+stock_sync = Table(
+    'stock_sync', MetaData(),
+    Column('line', Integer),
+    Column('product_id', Integer),
+    Column('name', String(255)),
+    Column('quantity', Integer),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DROP'
+)
+
+
+class Page(NamedTuple):
+    """
+    Страница каталога. prev и next - курсоры соседних страниц
+    (None, если страницы нет): положительный курсор - страница после
+    указанного id, отрицательный - страница до него
+    """
+    items: list
+    prev: Optional[int]
+    next: Optional[int]
 
 
 # ********** DECORATORS **********
-def connect_session_to_database(db_session):
-    def connect(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            async with db_session() as session:
-                async with session.begin():
-                    return await func(*args, session, **kwargs)
+def connect_session_to_database(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        # внутри обработки апдейта используется общая сессия единицы работы
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None and not unit_of_work.closed:
+            return await func(*args, await unit_of_work.get_session(), **kwargs)
 
-        return wrapper
-    return connect
+        async with DBEngine().session_maker() as session:
+            async with session.begin():
+                return await func(*args, session, **kwargs)
+
+    return wrapper
 
 
 class Singleton(type):
@@ -38,37 +77,88 @@ class Singleton(type):
         return cls._instance
 
 
+class DBEngine(metaclass=Singleton):
+    """
+    Подключение к бд. Движок и фабрика сессий создаются
+    при первом обращении, а не при импорте модуля
+    """
+
+    def __init__(self, url: str = DATABASE_URL):
+        self.url = url
+        self.__engine: Optional[AsyncEngine] = None
+        self.__session_maker: Optional[async_sessionmaker] = None
+
+    @staticmethod
+    def engine_options(url: str) -> dict:
+        """Возвращает настройки движка и пула соединений из config"""
+
+        options = dict(echo=DB_ECHO, pool_pre_ping=DB_POOL_PRE_PING)
+        backend = make_url(url).get_backend_name()
+
+        if backend == 'postgresql':
+            options.update(
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                connect_args={
+                    'statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+                    'command_timeout': DB_COMMAND_TIMEOUT,
+                    'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)}
+                }
+            )
+        return options
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self.__engine is None:
+            self.__engine = create_async_engine(self.url, **self.engine_options(self.url))
+        return self.__engine
+
+    @property
+    def session_maker(self) -> async_sessionmaker:
+        if self.__session_maker is None:
+            self.__session_maker = async_sessionmaker(
+                self.engine, expire_on_commit=False, class_=AsyncSession
+            )
+        return self.__session_maker
+
+    async def dispose(self) -> None:
+        """Закрывает все соединения пула"""
+        if self.__engine is not None:
+            await self.__engine.dispose()
+            self.__engine = None
+            self.__session_maker = None
+
+
 class DBMethods:
     """Интерфейс для реализации работы с данными в бд"""
 
-    # ********** CONNECT TO DB ********
-    __engine = create_async_engine(DATABASE_URL, future=True, echo=True)
-    __async_session_maker = async_sessionmaker(
-        __engine, expire_on_commit=False, class_=AsyncSession
-    )
-
     # ********** ALL OPERATIONS **********
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def add(self, model, session: AsyncSession, **kwargs):
         """Добавление новой записи в бд"""
-        new_object = await session.execute(insert(model).values(kwargs))
-        return new_object.scalars().first()
+        # savepoint, чтобы IntegrityError не обрывал общую транзакцию
+        async with session.begin_nested():
+            new_object = await session.execute(
+                insert(model).values(kwargs).returning(model))
+            return new_object.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def get_obj(self, model, session: AsyncSession, **kwargs):
         """Получение текущего объекта с бд"""
         get_object = await session.execute(
             select(model).filter_by(id=kwargs.get('id')))
         return get_object.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def get_all_obj(self, model, session: AsyncSession):
         """Получение всех объектов с бд по данной модели"""
         all_objects = await session.execute(select(model))
         return [obj[0] for obj in all_objects.fetchall()]
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def filter_all_obj(self, model, session: AsyncSession, **kwargs):
         """Пoлучение всех объектов с бд по данной модели по фильтру"""
         filtered_objects = await session.execute(
@@ -76,7 +166,28 @@ class DBMethods:
             )
         return [obj[0] for obj in filtered_objects.fetchall()]
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
+    async def select_page(self, model, session: AsyncSession, **kwargs) -> tuple[list, bool]:
+        """
+        Страница объектов по ключу id: cursor > 0 - после id cursor,
+        cursor < 0 - до id -cursor, 0 - с начала. Выбирается limit + 1
+        строка, чтобы узнать, есть ли еще объекты в направлении листания
+        """
+        cursor, limit = kwargs.get('cursor', 0), kwargs.get('limit')
+        query = select(model).filter(*kwargs.get('filters', ()))
+
+        if cursor < 0:
+            query = query.filter(model.id < -cursor).order_by(model.id.desc())
+        else:
+            query = query.filter(model.id > cursor).order_by(model.id)
+
+        result = await session.execute(query.limit(limit + 1))
+        objects = list(result.scalars().all())
+        items = objects[:limit]
+
+        return items[::-1] if cursor < 0 else items, len(objects) > limit
+
+    @connect_session_to_database
     async def get_count_obj(self, model, session: AsyncSession, **kwargs):
         """Получение количества объектов"""
         count = await session.execute(
@@ -85,68 +196,348 @@ class DBMethods:
         )
         return count.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def delete_obj(self, model, session: AsyncSession, **kwargs):
         """Удаление объектов с бд"""
-        category = await session.execute(
-            delete(model).filter_by(id=kwargs.get('id')).returning(model.id))
-        return category.scalars().first()
+        async with session.begin_nested():
+            category = await session.execute(
+                delete(model).filter_by(id=kwargs.get('id')).returning(model.id))
+            return category.scalars().first()
+
+    @connect_session_to_database
+    async def notify(self, session: AsyncSession, **kwargs) -> None:
+        """
+        Публикует уведомление в канал PostgreSQL NOTIFY,
+        оно будет доставлено слушателям после фиксации транзакции
+        """
+        await session.execute(
+            select(func.pg_notify(kwargs.get('channel'), kwargs.get('payload', '')))
+        )
+
+    # ********** CATALOG OPERATIONS **********
+    @connect_session_to_database
+    async def search_products(self, session: AsyncSession, **kwargs) -> List[Product]:
+        """
+        Поиск товаров на складе по названию и описанию (PostgreSQL, pg_trgm).
+        Подстрока ищется через ILIKE, опечатки - оператором <% (word_similarity),
+        оба условия используют GIN индексы триграмм
+        """
+        query = kwargs.get('query')
+        rank = func.greatest(func.word_similarity(query, Product.name),
+                             func.word_similarity(query, Product.title))
+
+        result = await session.execute(
+            select(Product).
+            filter(Product.quantity > 0,
+                   or_(Product.name.icontains(query, autoescape=True),
+                       Product.title.icontains(query, autoescape=True),
+                       literal(query).op('<%')(Product.name),
+                       literal(query).op('<%')(Product.title))).
+            order_by(rank.desc(), Product.id).
+            limit(kwargs.get('limit'))
+        )
+        return list(result.scalars().all())
+
+    # ********** CATALOG IMPORT **********
+    @connect_session_to_database
+    async def upsert_catalog(self, session: AsyncSession, **kwargs) -> tuple[int, int]:
+        """
+        Загружает пачку товаров каталога двумя запросами INSERT ... ON CONFLICT:
+        недостающие категории создаются, товары с тем же названием
+        в категории обновляются. rows - строки с полями category, name,
+        title, price, quantity. Возвращает (добавлено, обновлено)
+        """
+        rows = kwargs.get('rows')
+        names = sorted({row.category for row in rows})
+
+        await session.execute(
+            pg_insert(Category).values([{'name': name} for name in names]).
+            on_conflict_do_nothing(index_elements=[Category.name])
+        )
+        categories = dict((await session.execute(
+            select(Category.name, Category.id).filter(Category.name.in_(names))
+        )).tuples().all())
+
+        # одинаковый порядок строк у параллельных загрузок исключает взаимные блокировки
+        upsert = pg_insert(Product).values(sorted((
+            {'category_id': categories[row.category], 'name': row.name, 'title': row.title,
+             'price': row.price, 'quantity': row.quantity}
+            for row in rows), key=lambda row: (row['category_id'], row['name'])))
+        result = await session.execute(
+            upsert.on_conflict_do_update(
+                constraint='uq_product_category_name',
+                set_={'title': upsert.excluded.title, 'price': upsert.excluded.price,
+                      'quantity': upsert.excluded.quantity}
+            ).returning(literal_column('xmax = 0'))
+        )
+        inserted = result.scalars().all()
+        return sum(inserted), len(inserted) - sum(inserted)
+
+    @connect_session_to_database
+    async def select_catalog(self, session: AsyncSession, **kwargs) -> list[tuple]:
+        """
+        Строки каталога (id, категория, название, описание, цена, остаток)
+        в порядке id, не больше limit строк после id cursor
+        """
+        result = await session.execute(
+            select(Product.id, Category.name, Product.name, Product.title,
+                   Product.price, Product.quantity).
+            join(Category, Category.id == Product.category_id).
+            filter(Product.id > kwargs.get('cursor', 0)).
+            order_by(Product.id).
+            limit(kwargs.get('limit'))
+        )
+        return list(result.tuples().all())
+
+    @connect_session_to_database
+    async def sync_stock(self, session: AsyncSession, **kwargs) -> tuple[list, list, int]:
+        """
+        Обновляет остатки пачки товаров набором запросов, а не по товару:
+        строки (line, product_id, name, quantity) загружаются COPY во временную
+        таблицу, товар ищется по id либо по названию (если оно однозначно).
+        quantity - количество на складе, в product записывается то, что
+        не зарезервировано в заказах. При повторе товара берется последняя строка.
+        Возвращает (изменения (id, название, было, стало),
+        ненайденные строки (line, product_id, name), число найденных товаров).
+        dry_run - посчитать изменения и откатить их
+        """
+        async with session.begin_nested() as savepoint:
+            await session.execute(CreateTable(stock_sync))
+            connection = await (await session.connection()).get_raw_connection()
+            await connection.driver_connection.copy_records_to_table(
+                stock_sync.name, records=kwargs.get('rows'),
+                columns=[column.name for column in stock_sync.columns]
+            )
+            await session.execute(text('ANALYZE stock_sync'))
+
+            # товар по названию, если оно есть только у одного товара
+            duplicate = Product.__table__.alias('duplicate')
+            await session.execute(
+                update(stock_sync).
+                where(stock_sync.c.product_id.is_(None), Product.name == stock_sync.c.name,
+                      ~exists().where(duplicate.c.name == stock_sync.c.name,
+                                      duplicate.c.id != Product.id)).
+                values(product_id=Product.id)
+            )
+            missing = list((await session.execute(
+                select(stock_sync.c.line, stock_sync.c.product_id, stock_sync.c.name).
+                where(~exists().where(Product.id == stock_sync.c.product_id)).
+                order_by(stock_sync.c.line)
+            )).tuples().all())
+
+            # блокируем товары до подсчета резерва: заказы меняют резерв и остаток
+            # в одной транзакции, поэтому резерв будет согласован с остатком
+            found = (await session.execute(
+                select(Product.id).
+                where(Product.id.in_(select(stock_sync.c.product_id))).
+                order_by(Product.id).with_for_update()
+            )).scalars().all()
+
+            target = select(stock_sync.c.product_id, stock_sync.c.quantity).\
+                ext(distinct_on(stock_sync.c.product_id)).\
+                where(stock_sync.c.product_id.is_not(None)).\
+                order_by(stock_sync.c.product_id, stock_sync.c.line.desc()).subquery('target')
+            reserved = select(Order.product_id,
+                              cast(func.sum(Order.quantity), Integer).label('quantity')).\
+                where(Order.product_id.in_(select(stock_sync.c.product_id))).\
+                group_by(Order.product_id).subquery('reserved')
+            stock = select(
+                target.c.product_id,
+                func.greatest(target.c.quantity - func.coalesce(reserved.c.quantity, 0), 0).
+                label('quantity')
+            ).select_from(
+                target.outerjoin(reserved, reserved.c.product_id == target.c.product_id)
+            ).subquery('stock')
+            # снимок строки до обновления для отчета "было"
+            previous = Product.__table__.alias('previous')
+
+            result = await session.execute(
+                update(Product).
+                where(Product.id == stock.c.product_id, previous.c.id == stock.c.product_id,
+                      Product.quantity != stock.c.quantity).
+                values(quantity=stock.c.quantity).
+                returning(Product.id, Product.name, previous.c.quantity, Product.quantity)
+            )
+            changes = sorted(result.tuples().all())
+
+            if kwargs.get('dry_run'):
+                await savepoint.rollback()
+        return changes, missing, len(found)
 
     # ********** ORDERS OPERATIONS **********
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
+    async def select_user_orders(self, session: AsyncSession, **kwargs) -> List[Order]:
+        """Возвращает позиции заказа пользователя в порядке добавления"""
+        result = await session.execute(
+            select(Order).filter_by(user_id=kwargs.get('user_id')).order_by(Order.id)
+        )
+        return list(result.scalars().all())
+
+    @connect_session_to_database
     async def select_order_quantity(self, session: AsyncSession, **kwargs) -> Order:
         """Возвращает количество товара в заказе"""
         result = await session.execute(
-            select(Order).filter_by(product_id=kwargs.get('product_id'))
+            select(Order).filter_by(user_id=kwargs.get('user_id'),
+                                    product_id=kwargs.get('product_id'))
             )
         return result.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
-    async def update_order_value(self, session: AsyncSession, **kwargs) -> None:
+    @connect_session_to_database
+    async def reserve_stock(self, session: AsyncSession, **kwargs) -> Optional[tuple[int, int]]:
         """
-        Обновляет данные указанной позиции заказа
-        в соответствии с номером товара - rownum
+        Переносит quantity единиц товара со склада в существующую позицию
+        заказа одним запросом. Строка заказа блокируется первой, затем
+        остаток списывается условным UPDATE, поэтому он не уходит в минус.
+        Возвращает (количество в заказе, остаток на складе) либо None,
+        если товара на складе недостаточно или позиции в заказе нет
         """
-        await session.execute(
-            update(Order).filter_by(product_id=kwargs.get('product_id')).
-            values(quantity=kwargs.get('quantity'))
+        product_id = kwargs.get('product_id')
+        quantity = kwargs.get('quantity')
+
+        line = select(Order.id).filter_by(
+            user_id=kwargs.get('user_id'), product_id=product_id
+        ).with_for_update().cte('line')
+        stock = update(Product).where(
+            Product.id == product_id, Product.quantity >= quantity,
+            exists(line.select())
+        ).values(quantity=Product.quantity - quantity).returning(
+            Product.id, Product.quantity).cte('stock')
+
+        result = await session.execute(
+            update(Order).where(Order.id == line.c.id, Order.product_id == stock.c.id).
+            values(quantity=Order.quantity + quantity).
+            returning(Order.quantity, stock.c.quantity)
+        )
+        return result.tuples().first()
+
+    @connect_session_to_database
+    async def release_stock(self, session: AsyncSession, **kwargs) -> Optional[tuple[int, int]]:
+        """
+        Возвращает quantity единиц товара из позиции заказа на склад одним
+        запросом, в позиции остается хотя бы одна единица. Возвращает
+        (количество в заказе, остаток на складе) либо None, если вернуть нечего
+        """
+        product_id = kwargs.get('product_id')
+        quantity = kwargs.get('quantity')
+
+        line = update(Order).filter_by(
+            user_id=kwargs.get('user_id'), product_id=product_id
+        ).where(Order.quantity > quantity).values(
+            quantity=Order.quantity - quantity
+        ).returning(Order.product_id, Order.quantity).cte('line')
+
+        result = await session.execute(
+            update(Product).where(Product.id == line.c.product_id).
+            values(quantity=Product.quantity + quantity).
+            returning(line.c.quantity, Product.quantity)
+        )
+        return result.tuples().first()
+
+    @connect_session_to_database
+    async def remove_order_line(self, session: AsyncSession, **kwargs) -> Optional[int]:
+        """
+        Удаляет позицию заказа и возвращает её количество на склад одним
+        запросом. Возвращает остаток на складе либо None, если позиции уже нет
+        """
+        line = delete(Order).filter_by(
+            user_id=kwargs.get('user_id'), product_id=kwargs.get('product_id')
+        ).returning(Order.product_id, Order.quantity).cte('line')
+
+        result = await session.execute(
+            update(Product).where(Product.id == line.c.product_id).
+            values(quantity=Product.quantity + line.c.quantity).
+            returning(Product.quantity)
         )
+        return result.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
-    async def update_product_value(self, session: AsyncSession, **kwargs) -> None:
+    @connect_session_to_database
+    async def add_product_to_order(self, session: AsyncSession, **kwargs) -> int | None:
         """
-        Обновляет количество товара на складе
-        в соответствии с номером товара - rownum
+        Добавляет товар в заказ одной транзакцией: списывает остаток
+        со склада условным UPDATE и увеличивает (либо создает) позицию заказа.
+        Как и в reserve_stock/release_stock, строка заказа блокируется раньше
+        товара, поэтому параллельные изменения позиции не блокируют друг друга
+        взаимно. Возвращает остаток товара на складе или None, если товара не хватает
         """
+        product_id = kwargs.get('product_id')
+        user_id = kwargs.get('user_id')
+        quantity = kwargs.get('quantity')
+
+        # новой позиции ещё нет: её вставку упорядочит блокировка товара
         await session.execute(
-            update(Product).filter_by(id=kwargs.get('id')).
-            values(quantity=kwargs.get('quantity'))
+            select(Order.id).filter_by(user_id=user_id, product_id=product_id).
+            with_for_update()
+        )
+        stock = await session.execute(
+            update(Product).
+            where(Product.id == product_id, Product.quantity >= quantity).
+            values(quantity=Product.quantity - quantity).
+            returning(Product.quantity)
+        )
+        stock_left = stock.scalars().first()
+        if stock_left is None:
+            return None
+
+        upsert_order = pg_insert(Order).values(
+            quantity=quantity,
+            product_id=product_id,
+            user_id=user_id,
+            data=datetime.now()
         )
+        await session.execute(
+            upsert_order.on_conflict_do_update(
+                constraint='uq_order_user_product',
+                set_={'quantity': Order.quantity + upsert_order.excluded.quantity}
+            )
+        )
+        return stock_left
 
-    @connect_session_to_database(__async_session_maker)
+    @connect_session_to_database
     async def delete_product_order(self, session: AsyncSession, **kwargs):
         """Удаление конкретного товара с бд"""
         result = await session.execute(
-            delete(Order).filter_by(product_id=kwargs.get('product_id')).
+            delete(Order).filter_by(user_id=kwargs.get('user_id'),
+                                    product_id=kwargs.get('product_id')).
             returning(Order.id)
         )
         return result.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
-    async def count_rows_order(self, session: AsyncSession) -> int:
+    @connect_session_to_database
+    async def count_rows_order(self, session: AsyncSession, **kwargs) -> int:
         """Возвращает количество позиций в заказе"""
         result = await session.execute(
-            select(func.count(Order.product_id))
+            select(func.count(Order.product_id)).
+            filter_by(user_id=kwargs.get('user_id'))
         )
         return result.scalars().first()
 
-    @connect_session_to_database(__async_session_maker)
-    async def delete_order_all(self, session: AsyncSession):
-        """Удаляет данные всего заказа"""
-        all_orders = await self.get_all_obj(Order)
+    @connect_session_to_database
+    async def select_order_totals(self, session: AsyncSession, **kwargs) -> tuple:
+        """
+        Возвращает общую стоимость и общее количество товара в заказе
+        одним агрегирующим запросом
+        """
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(Order.quantity * Product.price), 0),
+                func.coalesce(func.sum(Order.quantity), 0)
+            ).
+            join(Product, Product.id == Order.product_id).
+            filter(Order.user_id == kwargs.get('user_id'))
+        )
+        return tuple(result.one())
 
-        for order in all_orders:
-            await session.execute(delete(Order).filter_by(id=order.id))
+    @connect_session_to_database
+    async def delete_order_all(self, session: AsyncSession, **kwargs) -> list:
+        """
+        Удаляет данные всего заказа пользователя одним запросом
+        и возвращает удаленные позиции (product_id, quantity)
+        """
+        result = await session.execute(
+            delete(Order).filter_by(user_id=kwargs.get('user_id')).
+            returning(Order.product_id, Order.quantity)
+        )
+        return list(result.all())
 
 
 class DBManager(metaclass=Singleton):
@@ -155,61 +546,92 @@ class DBManager(metaclass=Singleton):
     """
     def __init__(self):
         self.__crud_db = DBMethods()
+        self.__catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+        self.__search_cache = CatalogCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+    # ********** CATALOG CACHE **********
+    @property
+    def catalog_version(self) -> int:
+        """Версия каталога, меняется при каждом изменении категорий и товаров"""
+        return self.__catalog_cache.version
+
+    def invalidate_catalog(self) -> None:
+        """Сброс кэша каталога"""
+        self.__catalog_cache.invalidate()
+        self.__search_cache.invalidate()
+
+    async def __cached(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Возвращает значение из кэша каталога, при промахе загружает его из бд"""
+        value = self.__catalog_cache.get(key, _MISSING)
+        if value is _MISSING:
+            # сброс кэша во время загрузки не должен затираться устаревшим значением
+            version = self.__catalog_cache.version
+            value = await loader()
+            self.__catalog_cache.set(key, value, version)
+        return value
+
+    async def __catalog_changed(self) -> None:
+        """
+        Сбрасывает кэш каталога после фиксации изменений
+        и оповещает об этом другие процессы бота
+        """
+        if CATALOG_NOTIFY:
+            await self.__crud_db.notify(channel=CatalogListener.CHANNEL)
 
-    # ********** OTHER OPERATIONS WITH DATABASE **********
-    async def update_product_value(self, product_id: int, quantity: int):
-        """Обновление количества товара в бд"""
-        await self.__crud_db.update_product_value(
-            id=product_id, quantity=quantity)
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None and not unit_of_work.closed:
+            unit_of_work.on_commit(self.invalidate_catalog)
+        else:
+            self.invalidate_catalog()
 
-    async def __search_product_in_order(self, all_products: arr.array, product_id: int,
-                                        left: int, right: int) -> bool:
-        """Поиск товара в заказе"""
-        if left > right:
-            return False
+    async def __page(self, model, cursor: int, size: int, *filters) -> Page:
+        """Страница каталога по курсору, см. Page"""
+        items, has_more = await self.__crud_db.select_page(
+            model, cursor=cursor, limit=size, filters=filters)
 
-        midd = (left + right) // 2
+        if cursor and (not items or cursor < 0 and not has_more):
+            # курсор устарел либо до начала осталось меньше страницы
+            return await self.__page(model, 0, size, *filters)
+        if not items:
+            return Page([], None, None)
 
-        if all_products[midd] == product_id and all_products:
-            return True
-        elif product_id < all_products[midd]:
-            await self.__search_product_in_order(all_products, product_id, left, midd - 1)
-        else:
-            await self.__search_product_in_order(all_products, product_id, midd + 1, right)
-
-    async def update_order_value(self, product_id: int, quantity: int):
-        """Обновление количества товара в заказе"""
-        await self.__crud_db.update_order_value(
-            product_id=product_id, quantity=quantity)
+        has_prev, has_next = (has_more, True) if cursor < 0 else (cursor > 0, has_more)
+        return Page(items, -items[0].id if has_prev else None, items[-1].id if has_next else None)
 
     # ********** OPERATIONS WITH CATEGORIES **********
 
     async def add_category(self, name: str) -> Category:
         """Добавление новой категории"""
-        return await self.__crud_db.add(Category, name=name)
+        category = await self.__crud_db.add(Category, name=name)
+        await self.__catalog_changed()
+        return category
 
     async def get_category(self, category_id: int) -> Category:
         """Получение конкретной категории"""
-        return await self.__crud_db.get_obj(Category, id=category_id)
+        return await self.__cached(
+            ('category', category_id),
+            lambda: self.__crud_db.get_obj(Category, id=category_id)
+        )
 
     async def delete_category(self, category_id: int) -> Category:
         """Удаление категории"""
-        return await self.__crud_db.delete_obj(Category, id=category_id)
-
-    async def all_categories(self) -> List[Category]:
-        """Вывод всех категорий"""
-        return await self.__crud_db.get_all_obj(Category)
-
-    async def get_count_products(self, category_id: int) -> int:
-        """Получение количества продуктов"""
-        return await self.__crud_db.get_count_obj(Product, category_id=category_id)
+        category = await self.__crud_db.delete_obj(Category, id=category_id)
+        await self.__catalog_changed()
+        return category
+
+    async def categories_page(self, cursor: int = 0, size: int = CATALOG_PAGE_SIZE) -> Page:
+        """Страница категорий"""
+        return await self.__cached(
+            ('categories_page', cursor, size),
+            lambda: self.__page(Category, cursor, size)
+        )
 
     # ********** END OPERATIONS WITH CATEGORIES **********
 
     # ********** OPERATIONS WITH PRODUCTS **********
     async def add_product(self, **kwargs) -> Product:
         """Добавление нового товара"""
-        return await self.__crud_db.add(
+        product = await self.__crud_db.add(
             Product,
             name=kwargs.get('name'),
             title=kwargs.get('title'),
@@ -217,11 +639,43 @@ class DBManager(metaclass=Singleton):
             quantity=kwargs.get('quantity'),
             category_id=kwargs.get('category_id')
         )
+        await self.__catalog_changed()
+        return product
+
+    async def products_page(self, category_id: int, cursor: int = 0,
+                            size: int = CATALOG_PAGE_SIZE) -> Page:
+        """Страница товаров категории, которые есть на складе"""
+        return await self.__cached(
+            ('products_page', category_id, cursor, size),
+            lambda: self.__page(Product, cursor, size,
+                                Product.category_id == category_id, Product.quantity > 0)
+        )
 
-    async def all_products(self, category_id: int) -> List[Product]:
-        """Вывод всех продуктов"""
-        return await self.__crud_db.filter_all_obj(
-            Product, category_id=category_id)
+    async def search_products(self, query: str, limit: int = SEARCH_RESULTS_LIMIT) -> List[Product]:
+        """
+        Поиск товаров для inline-режима. Результаты по одной строке запроса
+        кэшируются на SEARCH_CACHE_TTL. Для PostgreSQL поиск идет по индексу
+        pg_trgm, для других бд - по индексу триграмм в памяти процесса
+        """
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+
+        products = self.__search_cache.get((query, limit))
+        if products is None:
+            version = self.__search_cache.version
+            if DBEngine().engine.dialect.name == 'postgresql':
+                products = await self.__crud_db.search_products(query=query, limit=limit)
+            else:
+                index = await self.__cached(('search_index',), self.__build_search_index)
+                products = index.search(query, limit)
+            self.__search_cache.set((query, limit), products, version)
+
+        return products
+
+    async def __build_search_index(self) -> TrigramIndex:
+        products = await self.__crud_db.get_all_obj(Product)
+        return TrigramIndex(product for product in products if product.quantity > 0)
 
     async def get_product(self, product_id: int) -> Product:
         return await self.__crud_db.get_obj(Product, id=product_id)
@@ -233,73 +687,103 @@ class DBManager(metaclass=Singleton):
 
     async def delete_product(self, product_id: int) -> Product:
         """Удаление товара с бд"""
-        return await self.__crud_db.delete_obj(Product, id=product_id)
+        product = await self.__crud_db.delete_obj(Product, id=product_id)
+        await self.__catalog_changed()
+        return product
 
     # ********** END OPERATIONS WITH PRODUCTS **********
 
-    # ********** OPERATIONS WITH ORDERS **********
-    async def add_orders(self, quantity: int, product_id: int, user_id: int) -> None:
-        """Метод заполнения заказа"""
-
-        all_id_products = await self.select_all_product_id()
-        left, right = (0, len(all_id_products) - 1)
-        search_product = await self.__search_product_in_order(
-            all_id_products, product_id, left, right
-        )
+    # ********** CATALOG IMPORT / EXPORT **********
+    async def import_catalog(self, rows: list) -> tuple[int, int]:
+        """Пакетная загрузка товаров каталога, возвращает (добавлено, обновлено)"""
+        result = await self.__crud_db.upsert_catalog(rows=rows)
+        await self.__catalog_changed()
+        return result
+
+    async def sync_stock(self, rows: list, dry_run: bool = False) -> tuple[list, list, int]:
+        """Синхронизация остатков пачки товаров со складом, см. DBMethods.sync_stock"""
+        changes, missing, found = await self.__crud_db.sync_stock(rows=rows, dry_run=dry_run)
+        if changes and not dry_run:
+            await self.__catalog_changed()
+        return changes, missing, found
+
+    async def export_catalog(self, batch_size: int = IMPORT_BATCH_SIZE) -> AsyncIterator[list[tuple]]:
+        """
+        Выгружает каталог пачками по batch_size строк
+        (категория, название, описание, цена, остаток)
+        """
+        cursor = 0
+        while rows := await self.__crud_db.select_catalog(cursor=cursor, limit=batch_size):
+            yield [row[1:] for row in rows]
+            cursor = rows[-1][0]
 
-        if search_product:
-            quantity_order = await self.select_order_quantity(product_id)
-            quantity_order += 1
-            await self.update_order_value(product_id, quantity_order)
+    # ********** OPERATIONS WITH ORDERS **********
+    async def add_orders(self, quantity: int, product_id: int, user_id: int) -> int | None:
+        """
+        Метод заполнения заказа. Возвращает остаток товара на складе
+        либо None, если товара на складе недостаточно
+        """
+        return await self.__crud_db.add_product_to_order(
+            quantity=quantity, product_id=product_id, user_id=user_id)
 
-            quantity_product = await self.select_product_quantity(product_id)
-            quantity_product -= 1
-            await self.update_product_value(product_id, quantity_product)
+    async def increase_order(self, user_id: int, product_id: int,
+                             quantity: int = 1) -> Optional[tuple[int, int]]:
+        """
+        Добавляет единицы товара в позицию заказа, списывая их со склада.
+        Возвращает (количество в заказе, остаток на складе)
+        либо None, если товара на складе недостаточно
+        """
+        return await self.__crud_db.reserve_stock(
+            user_id=user_id, product_id=product_id, quantity=quantity)
 
-        else:
-            await self.__crud_db.add(
-                Order,
-                quantity=quantity,
-                product_id=product_id,
-                user_id=user_id,
-                data=datetime.now()
-            )
+    async def decrease_order(self, user_id: int, product_id: int,
+                             quantity: int = 1) -> Optional[tuple[int, int]]:
+        """
+        Убирает единицы товара из позиции заказа, возвращая их на склад.
+        Возвращает (количество в заказе, остаток на складе)
+        либо None, если в позиции не осталось лишних единиц
+        """
+        return await self.__crud_db.release_stock(
+            user_id=user_id, product_id=product_id, quantity=quantity)
 
-            quantity_product = await self.select_product_quantity(product_id)
-            quantity_product -= 1
-            await self.update_product_value(product_id, quantity_product)
+    async def remove_from_order(self, user_id: int, product_id: int) -> Optional[int]:
+        """
+        Удаляет позицию заказа, возвращая товар на склад. Возвращает
+        остаток на складе либо None, если позиции в заказе уже нет
+        """
+        return await self.__crud_db.remove_order_line(user_id=user_id, product_id=product_id)
 
-    async def count_rows_order(self) -> int:
+    async def count_rows_order(self, user_id: int) -> int:
         """Возвращает количество позиций в заказе"""
-        return await self.__crud_db.count_rows_order()
+        return await self.__crud_db.count_rows_order(user_id=user_id)
 
-    async def select_all_product_order(self) -> List[Order]:
-        """получаем список всех товаров в заказе"""
-        return await self.__crud_db.get_all_obj(Order)
+    async def select_all_product_order(self, user_id: int) -> List[Order]:
+        """получаем список всех товаров в заказе пользователя"""
+        return await self.__crud_db.select_user_orders(user_id=user_id)
 
-    async def select_all_product_id(self) -> arr.array:
+    async def select_all_product_id(self, user_id: int) -> arr.array:
         """Получение со списка товаров в заказе, список id товаров"""
-        all_products = await self.select_all_product_order()
+        all_products = await self.select_all_product_order(user_id)
         return arr.array('i', (product.product_id for product in all_products))
 
-    async def select_order_quantity(self, product_id: int) -> int:
+    async def select_order_quantity(self, user_id: int, product_id: int) -> Optional[int]:
         """
         Возвращает количество товара из заказа
-        в соответствии с номером товара - rownum
+        либо None, если товара в заказе нет
         """
         select_order = await self.__crud_db.select_order_quantity(
-            product_id=product_id)
-        return select_order.quantity
-
-    async def delete_product_order(self, product_id: int) -> Order:
-        """Удаление конкретного товара с бд"""
-        return await self.__crud_db.delete_product_order(product_id=product_id)
-
-    async def delete_order_all(self) -> None:
-        """Удаляет данные всего заказа"""
-        await self.__crud_db.delete_order_all()
-
-
+            user_id=user_id, product_id=product_id)
+        return select_order.quantity if select_order is not None else None
 
+    async def select_order_totals(self, user_id: int) -> tuple[Decimal, int]:
+        """Возвращает общую стоимость и общее количество товара в заказе"""
+        return await self.__crud_db.select_order_totals(user_id=user_id)
 
+    async def delete_product_order(self, user_id: int, product_id: int) -> Order:
+        """Удаление конкретного товара с бд"""
+        return await self.__crud_db.delete_product_order(
+            user_id=user_id, product_id=product_id)
 
+    async def delete_order_all(self, user_id: int) -> list:
+        """Удаляет данные всего заказа и возвращает удаленные позиции"""
+        return await self.__crud_db.delete_order_all(user_id=user_id)
@@ -0,0 +1,147 @@
+"""
+Проверка планов запросов DBMethods на PostgreSQL.
+
+Скрипт заполняет бд тестовыми данными, выполняет запросы горячих путей
+(каталог, корзина, поиск) и проверяет через EXPLAIN, что таблицы
+product и order читаются по индексам, а не полным перебором.
+Все изменения откатываются, бд остается в исходном состоянии.
+
+    python -m src.database.explain
+"""
+import asyncio
+import json
+import sys
+
+from sqlalchemy import event, text
+
+from src.database.tables import Product
+from .dbalchemy import DBEngine, DBMethods
+from .unit_of_work import UnitOfWork, current_unit_of_work
+
+# таблицы, которые не должны читаться полным перебором
+HOT_TABLES = frozenset({'product', 'order'})
+
+CATEGORIES = 200
+PRODUCTS_PER_CATEGORY = 100
+USERS = 2000
+ORDERS_PER_USER = 10
+
+SEED = (
+    f"""
+    INSERT INTO category (name, is_active, created_at)
+    SELECT 'explain category ' || n, true, now() FROM generate_series(1, {CATEGORIES}) AS n
+    """,
+    f"""
+    INSERT INTO product (name, title, price, quantity, is_active, created_at, category_id)
+    SELECT 'explain product ' || c.id || '-' || n, 'product ' || n, 10, 100, true, now(), c.id
+    FROM category AS c, generate_series(1, {PRODUCTS_PER_CATEGORY}) AS n
+    WHERE c.name LIKE 'explain category %'
+    """,
+    f"""
+    INSERT INTO "order" (quantity, data, product_id, user_id)
+    SELECT 1, now(), p.id, u
+    FROM generate_series(1, {USERS}) AS u
+    CROSS JOIN LATERAL (
+        SELECT id FROM product
+        WHERE name LIKE 'explain product %'
+        ORDER BY random() + u LIMIT {ORDERS_PER_USER}
+    ) AS p
+    """,
+    'ANALYZE category',
+    'ANALYZE product',
+    'ANALYZE "order"',
+)
+
+
+def scans(plan: dict):
+    """Обходит узлы плана, возвращает (тип узла, таблица, индекс) для чтения таблиц"""
+    if 'Relation Name' in plan:
+        yield plan['Node Type'], plan['Relation Name'], plan.get('Index Name')
+    for child in plan.get('Plans', ()):
+        yield from scans(child)
+
+
+async def sample(session) -> tuple[int, int, int]:
+    """Возвращает категорию, товар и пользователя с заказом из тестовых данных"""
+    result = await session.execute(text("""
+        SELECT p.category_id, o.product_id, o.user_id
+        FROM "order" AS o JOIN product AS p ON p.id = o.product_id
+        WHERE p.name LIKE 'explain product %'
+        LIMIT 1
+    """))
+    return tuple(result.one())
+
+
+async def explain() -> bool:
+    db = DBMethods()
+    engine = DBEngine()
+    unit_of_work = UnitOfWork(engine)
+    current_unit_of_work.set(unit_of_work)
+
+    try:
+        session = await unit_of_work.get_session()
+        for statement in SEED:
+            await session.execute(text(statement))
+        category_id, product_id, user_id = await sample(session)
+
+        checks = {
+            'filter_all_obj': lambda: db.filter_all_obj(Product, category_id=category_id),
+            'get_count_obj': lambda: db.get_count_obj(Product, category_id=category_id),
+            'select_page': lambda: db.select_page(
+                Product, cursor=product_id, limit=8,
+                filters=(Product.category_id == category_id, Product.quantity > 0)),
+            'get_obj': lambda: db.get_obj(Product, id=product_id),
+            'search_products': lambda: db.search_products(query='product 42', limit=20),
+            'select_user_orders': lambda: db.select_user_orders(user_id=user_id),
+            'select_order_quantity': lambda: db.select_order_quantity(
+                user_id=user_id, product_id=product_id),
+            'count_rows_order': lambda: db.count_rows_order(user_id=user_id),
+            'select_order_totals': lambda: db.select_order_totals(user_id=user_id),
+            'reserve_stock': lambda: db.reserve_stock(
+                user_id=user_id, product_id=product_id, quantity=1),
+            'release_stock': lambda: db.release_stock(
+                user_id=user_id, product_id=product_id, quantity=1),
+            'add_product_to_order': lambda: db.add_product_to_order(
+                user_id=user_id, product_id=product_id, quantity=1),
+            'remove_order_line': lambda: db.remove_order_line(
+                user_id=user_id, product_id=product_id),
+            'delete_product_order': lambda: db.delete_product_order(
+                user_id=user_id, product_id=product_id),
+            'delete_order_all': lambda: db.delete_order_all(user_id=user_id),
+        }
+
+        ok = True
+        connection = await session.connection()
+        for name, check in checks.items():
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+
+            # запросы выполняются по-настоящему, затем объясняются с теми же параметрами
+            event.listen(engine.engine.sync_engine, 'before_cursor_execute', capture)
+            try:
+                await check()
+            finally:
+                event.remove(engine.engine.sync_engine, 'before_cursor_execute', capture)
+
+            for statement, parameters in statements:
+                result = await connection.exec_driver_sql(
+                    'EXPLAIN (FORMAT JSON) ' + statement, parameters)
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+
+                for node, table, index in scans(plan[0]['Plan']):
+                    failed = table in HOT_TABLES and node == 'Seq Scan'
+                    ok = ok and not failed
+                    print(f"{'FAIL' if failed else 'ok  '} {name}: {node} on {table}"
+                          + (f' using {index}' if index else ''))
+        return ok
+    finally:
+        current_unit_of_work.set(None)
+        await unit_of_work.rollback()
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    sys.exit(0 if asyncio.run(explain()) else 1)
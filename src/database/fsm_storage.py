@@ -0,0 +1,231 @@
+import asyncio
+import copy
+import logging
+import typing
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aiogram.dispatcher.storage import BaseStorage
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from src.database.tables import FSMState
+from .dbalchemy import DBEngine
+
+Address = tuple[int, int]
+Record = tuple[Optional[str], dict, datetime]
+
+
+class SQLAlchemyStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в бд: PostgreSQL в работе,
+    файл SQLite (sqlite+aiosqlite:///fsm.sqlite3) при разработке.
+
+    Изменения копятся в памяти и записываются пачкой раз в flush_interval
+    секунд (0 - запись сразу). Запись пачки не затирает более новое
+    состояние, записанное другим процессом, поэтому несколько
+    процессов бота могут работать с одним хранилищем.
+    Состояния, не менявшиеся дольше state_ttl секунд, удаляются
+    """
+
+    def __init__(self, url: str, flush_interval: float = 0.2,
+                 state_ttl: float = 86400, cleanup_interval: float = 600):
+        self.__engine = create_async_engine(url, **DBEngine.engine_options(url))
+        self.__session_maker = async_sessionmaker(
+            self.__engine, expire_on_commit=False, class_=AsyncSession
+        )
+        self.flush_interval = flush_interval
+        self.state_ttl = state_ttl
+        self.cleanup_interval = cleanup_interval
+
+        # изменения, ожидающие записи, и изменения, которые записываются сейчас
+        self.__pending: dict[Address, Record] = {}
+        self.__flushing: dict[Address, Record] = {}
+        self.__flush_lock = asyncio.Lock()
+        self.__flush_task: Optional[asyncio.Task] = None
+        self.__cleanup_task: Optional[asyncio.Task] = None
+        self.__table_ready = self.__engine.dialect.name != 'sqlite'
+
+    # ********** STORAGE **********
+
+    def __address(self, chat, user) -> Address:
+        chat, user = self.check_address(chat=chat, user=user)
+        return int(chat), int(user)
+
+    def __expired_before(self) -> datetime:
+        return datetime.now() - timedelta(seconds=self.state_ttl)
+
+    async def __prepare_table(self) -> None:
+        """Для SQLite таблица создается на лету, для PostgreSQL - миграцией"""
+        if not self.__table_ready:
+            async with self.__engine.begin() as connection:
+                await connection.run_sync(FSMState.__table__.create, checkfirst=True)
+            self.__table_ready = True
+
+    async def __read(self, chat, user) -> tuple[Optional[str], dict]:
+        address = self.__address(chat, user)
+
+        record = self.__pending.get(address) or self.__flushing.get(address)
+        if record is not None:
+            return record[0], copy.deepcopy(record[1])
+
+        await self.__prepare_table()
+        async with self.__session_maker() as session:
+            result = await session.execute(
+                select(FSMState.state, FSMState.data).
+                filter_by(chat=address[0], user=address[1]).
+                filter(FSMState.updated_at >= self.__expired_before())
+            )
+            row = result.first()
+
+        return (row.state, row.data) if row is not None else (None, {})
+
+    async def __write(self, chat, user, state: Optional[str], data: dict) -> None:
+        self.__pending[self.__address(chat, user)] = (state, copy.deepcopy(data), datetime.now())
+
+        if self.__cleanup_task is None:
+            self.__cleanup_task = asyncio.create_task(self.__cleanup_loop())
+
+        if self.flush_interval <= 0:
+            await self.flush()
+        elif self.__flush_task is None or self.__flush_task.done():
+            self.__flush_task = asyncio.create_task(self.__delayed_flush())
+
+    async def __delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f'failed to flush fsm states: {e}')
+
+    def __upsert(self, rows: list[dict]):
+        insert = pg_insert if self.__engine.dialect.name == 'postgresql' else sqlite_insert
+        statement = insert(FSMState).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[FSMState.chat, FSMState.user],
+            set_={
+                'state': statement.excluded.state,
+                'data': statement.excluded.data,
+                'updated_at': statement.excluded.updated_at,
+            },
+            # не затираем более новое состояние, записанное другим процессом
+            where=FSMState.updated_at <= statement.excluded.updated_at
+        )
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения одной транзакцией"""
+        async with self.__flush_lock:
+            if not self.__pending:
+                return
+            self.__flushing, self.__pending = self.__pending, {}
+
+            rows, finished = [], []
+            for (chat, user), (state, data, updated_at) in self.__flushing.items():
+                if state is None and not data:
+                    finished.append(((chat, user), updated_at))
+                else:
+                    rows.append(dict(chat=chat, user=user, state=state,
+                                     data=data, updated_at=updated_at))
+
+            try:
+                await self.__prepare_table()
+                async with self.__session_maker() as session:
+                    async with session.begin():
+                        if rows:
+                            await session.execute(self.__upsert(rows))
+                        if finished:
+                            # у каждого адреса своя отметка: более новое состояние
+                            # другого процесса по этому адресу не удаляется
+                            await session.execute(
+                                delete(FSMState).where(or_(*(
+                                    and_(FSMState.chat == chat, FSMState.user == user,
+                                         FSMState.updated_at <= updated_at)
+                                    for (chat, user), updated_at in finished
+                                )))
+                            )
+            except Exception:
+                # более свежие изменения из pending важнее неудавшейся пачки
+                for address, record in self.__flushing.items():
+                    self.__pending.setdefault(address, record)
+                raise
+            finally:
+                self.__flushing = {}
+
+    async def cleanup(self) -> int:
+        """Удаляет состояния, которые не менялись дольше state_ttl"""
+        await self.__prepare_table()
+        async with self.__session_maker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    delete(FSMState).where(FSMState.updated_at < self.__expired_before())
+                )
+        return result.rowcount
+
+    async def __cleanup_loop(self) -> None:
+        while True:
+            try:
+                await self.cleanup()
+            except Exception as e:
+                logging.error(f'failed to cleanup fsm states: {e}')
+            await asyncio.sleep(self.cleanup_interval)
+
+    async def close(self) -> None:
+        for task in (self.__flush_task, self.__cleanup_task):
+            if task is not None and not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        await self.flush()
+        await self.__engine.dispose()
+
+    async def wait_closed(self) -> None:
+        pass
+
+    # ********** FSM OPERATIONS **********
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        state, _ = await self.__read(chat, user)
+        return state if state is not None else default
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[typing.Dict] = None) -> typing.Dict:
+        _, data = await self.__read(chat, user)
+        return data or copy.deepcopy(default or {})
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.Optional[typing.AnyStr] = None):
+        _, data = await self.__read(chat, user)
+        await self.__write(chat, user, self.resolve_state(state), data)
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        state, _ = await self.__read(chat, user)
+        await self.__write(chat, user, state, data or {})
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None,
+                          **kwargs):
+        state, current_data = await self.__read(chat, user)
+        current_data.update(data or {}, **kwargs)
+        await self.__write(chat, user, state, current_data)
+
+    async def reset_state(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          with_data: typing.Optional[bool] = True):
+        state_data = {} if with_data else (await self.__read(chat, user))[1]
+        await self.__write(chat, user, None, state_data)
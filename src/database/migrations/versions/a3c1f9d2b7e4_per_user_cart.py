@@ -0,0 +1,55 @@
+"""per user cart
+
+Revision ID: a3c1f9d2b7e4
+Revises: 6b58e983128f
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c1f9d2b7e4'
+down_revision = '6b58e983128f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # id пользователей Telegram не помещаются в int4
+    op.alter_column('order', 'user_id',
+                    existing_type=sa.Integer(),
+                    type_=sa.BigInteger(),
+                    existing_nullable=False)
+
+    # схлопываем дубли позиций одного товара у пользователя
+    op.execute("""
+        UPDATE "order" AS o SET quantity = d.quantity
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS quantity
+            FROM "order"
+            GROUP BY user_id, product_id
+            HAVING count(*) > 1
+        ) AS d
+        WHERE o.id = d.id
+    """)
+    op.execute("""
+        DELETE FROM "order" AS o
+        USING "order" AS k
+        WHERE o.user_id = k.user_id
+          AND o.product_id = k.product_id
+          AND o.id > k.id
+    """)
+
+    op.create_unique_constraint('uq_order_user_product', 'order', ['user_id', 'product_id'])
+    op.create_index('ix_order_user_id_id', 'order', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_user_id_id', table_name='order')
+    op.drop_constraint('uq_order_user_product', 'order', type_='unique')
+    op.alter_column('order', 'user_id',
+                    existing_type=sa.BigInteger(),
+                    type_=sa.Integer(),
+                    existing_nullable=False)
@@ -0,0 +1,33 @@
+"""numeric price
+
+Revision ID: a7c3e5f9b1d4
+Revises: d2f6a9c4e8b1
+Create Date: 2026-10-18 19:46:12.881530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f9b1d4'
+down_revision = 'd2f6a9c4e8b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # цены хранятся точно, до копейки; float округляется при переносе
+    op.alter_column('product', 'price',
+                    existing_type=sa.Float(),
+                    type_=sa.Numeric(12, 2),
+                    existing_nullable=False,
+                    postgresql_using='round(price::numeric, 2)')
+
+
+def downgrade() -> None:
+    op.alter_column('product', 'price',
+                    existing_type=sa.Numeric(12, 2),
+                    type_=sa.Float(),
+                    existing_nullable=False,
+                    postgresql_using='price::double precision')
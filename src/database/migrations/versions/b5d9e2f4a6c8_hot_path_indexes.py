@@ -0,0 +1,32 @@
+"""hot path indexes
+
+Revision ID: b5d9e2f4a6c8
+Revises: f3a8c1d5e7b2
+Create Date: 2026-10-18 18:24:09.158342
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d9e2f4a6c8'
+down_revision = 'f3a8c1d5e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # индексы строятся без блокировки записи в таблицы работающего бота
+    with op.get_context().autocommit_block():
+        op.create_index('ix_product_category_id_id', 'product', ['category_id', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_order_product_id', 'order', ['product_id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_order_product_id', table_name='order',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_product_category_id_id', table_name='product',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""product catalog key
+
+Revision ID: c4e8b2d6f0a3
+Revises: a7c3e5f9b1d4
+Create Date: 2026-10-18 20:31:55.270946
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8b2d6f0a3'
+down_revision = 'a7c3e5f9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # одноименные товары категории различаем по id, чтобы не терять заказы и остатки
+    op.execute("""
+        UPDATE product AS p SET name = left(p.name, 240) || ' #' || p.id
+        FROM product AS k
+        WHERE p.category_id = k.category_id
+          AND p.name = k.name
+          AND p.id > k.id
+    """)
+    # ключ товара для импорта каталога (INSERT ... ON CONFLICT)
+    op.create_unique_constraint('uq_product_category_name', 'product', ['category_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_product_category_name', 'product', type_='unique')
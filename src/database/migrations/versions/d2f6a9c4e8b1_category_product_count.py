@@ -0,0 +1,87 @@
+"""category product count
+
+Revision ID: d2f6a9c4e8b1
+Revises: b5d9e2f4a6c8
+Create Date: 2026-10-18 19:02:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6a9c4e8b1'
+down_revision = 'b5d9e2f4a6c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('category', sa.Column('product_count', sa.Integer(),
+                                        server_default='0', nullable=False))
+
+    # вставка и удаление: один UPDATE категорий на запрос, а не на каждую строку
+    op.execute("""
+        CREATE FUNCTION category_product_count_insert() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE category AS c SET product_count = c.product_count + n.count
+            FROM (SELECT category_id, count(*) AS count FROM inserted GROUP BY category_id) AS n
+            WHERE c.id = n.category_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION category_product_count_delete() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE category AS c SET product_count = c.product_count - n.count
+            FROM (SELECT category_id, count(*) AS count FROM deleted GROUP BY category_id) AS n
+            WHERE c.id = n.category_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    # перенос товара в другую категорию; изменение остатков триггер не вызывает
+    op.execute("""
+        CREATE FUNCTION category_product_count_move() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE category SET product_count = product_count - 1 WHERE id = OLD.category_id;
+            UPDATE category SET product_count = product_count + 1 WHERE id = NEW.category_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER product_count_insert AFTER INSERT ON product
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION category_product_count_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_count_delete AFTER DELETE ON product
+        REFERENCING OLD TABLE AS deleted
+        FOR EACH STATEMENT EXECUTE FUNCTION category_product_count_delete()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_count_move AFTER UPDATE OF category_id ON product
+        FOR EACH ROW WHEN (OLD.category_id IS DISTINCT FROM NEW.category_id)
+        EXECUTE FUNCTION category_product_count_move()
+    """)
+
+    op.execute("""
+        UPDATE category AS c SET product_count = (
+            SELECT count(*) FROM product AS p WHERE p.category_id = c.id
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER product_count_move ON product')
+    op.execute('DROP TRIGGER product_count_delete ON product')
+    op.execute('DROP TRIGGER product_count_insert ON product')
+    op.execute('DROP FUNCTION category_product_count_move()')
+    op.execute('DROP FUNCTION category_product_count_delete()')
+    op.execute('DROP FUNCTION category_product_count_insert()')
+    op.drop_column('category', 'product_count')
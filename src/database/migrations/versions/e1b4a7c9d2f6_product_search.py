@@ -0,0 +1,28 @@
+"""product search
+
+Revision ID: e1b4a7c9d2f6
+Revises: c7d2e5a1f3b9
+Create Date: 2026-10-18 15:12:44.402911
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b4a7c9d2f6'
+down_revision = 'c7d2e5a1f3b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_product_name_trgm', 'product', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_product_title_trgm', 'product', ['title'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_title_trgm', table_name='product')
+    op.drop_index('ix_product_name_trgm', table_name='product')
@@ -0,0 +1,29 @@
+"""stock checks
+
+Revision ID: f3a8c1d5e7b2
+Revises: e1b4a7c9d2f6
+Create Date: 2026-10-18 16:05:21.730164
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d5e7b2'
+down_revision = 'e1b4a7c9d2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # данные, записанные до появления ограничений
+    op.execute('UPDATE product SET quantity = 0 WHERE quantity < 0')
+    op.execute('DELETE FROM "order" WHERE quantity < 1')
+
+    op.create_check_constraint('ck_product_quantity_non_negative', 'product', 'quantity >= 0')
+    op.create_check_constraint('ck_order_quantity_positive', 'order', 'quantity >= 1')
+
+
+def downgrade() -> None:
+    op.drop_constraint('ck_order_quantity_positive', 'order', type_='check')
+    op.drop_constraint('ck_product_quantity_non_negative', 'product', type_='check')
@@ -0,0 +1,62 @@
+import re
+from collections import Counter, defaultdict
+from typing import Iterable
+
+_WORD = re.compile(r'\w+')
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Триграммы строки по правилам pg_trgm: строка приводится к нижнему
+    регистру, каждое слово дополняется двумя пробелами слева и одним справа
+    """
+    result = set()
+    for word in _WORD.findall(text.lower()):
+        word = f'  {word} '
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм названий товаров в памяти процесса.
+    Заменяет индекс pg_trgm, когда бд не PostgreSQL (SQLite при разработке).
+    Оценка совпадения - доля триграмм запроса, найденных в названии
+    или описании товара, что близко к word_similarity из pg_trgm
+    """
+
+    def __init__(self, products: Iterable, threshold: float = 0.5):
+        self.threshold = threshold
+        self.__products = {}
+        self.__texts: dict[int, str] = {}
+        self.__postings: defaultdict[str, set[int]] = defaultdict(set)
+
+        for product in products:
+            self.__products[product.id] = product
+            self.__texts[product.id] = f'{product.name} {product.title}'.lower()
+            for trigram in trigrams(self.__texts[product.id]):
+                self.__postings[trigram].add(product.id)
+
+    def __len__(self) -> int:
+        return len(self.__products)
+
+    def search(self, query: str, limit: int) -> list:
+        """Возвращает до limit товаров, лучшие совпадения первыми"""
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            return []
+
+        hits = Counter()
+        for trigram in query_trigrams:
+            hits.update(self.__postings.get(trigram, ()))
+
+        query = query.lower()
+        scored = []
+        for product_id, count in hits.items():
+            # вхождение запроса подстрокой считается полным совпадением
+            score = 1.0 if query in self.__texts[product_id] else count / len(query_trigrams)
+            if score >= self.threshold:
+                scored.append((-score, product_id))
+
+        scored.sort()
+        return [self.__products[product_id] for _, product_id in scored[:limit]]
@@ -0,0 +1,102 @@
+"""
+Синхронизация остатков товаров со складом.
+
+Строки (id или название товара, количество на складе) применяются
+пачками по STOCK_SYNC_BATCH_SIZE: каждая пачка загружается во временную
+таблицу и обновляет остатки одним UPDATE (DBManager.sync_stock).
+Отчет содержит изменения остатков и строки, для которых товар не найден.
+Запуск из командной строки - sync_stock.py рядом с bot.py
+"""
+from typing import Awaitable, Callable, Iterable, Iterator, NamedTuple, Optional
+
+from src.config import STOCK_SYNC_BATCH_SIZE
+from .catalog_io import MAX_ERRORS, MAX_LENGTH, parse_count, read_rows
+from .dbalchemy import DBManager
+from .unit_of_work import current_unit_of_work
+
+
+class StockRow(NamedTuple):
+    """Остаток товара на складе: товар задается id либо названием"""
+    line: int
+    product_id: Optional[int]
+    name: Optional[str]
+    quantity: int
+
+
+class SyncReport:
+    """Итоги синхронизации остатков"""
+
+    __slots__ = ('rows', 'found', 'changes', 'missing', 'failed', 'errors')
+
+    def __init__(self):
+        self.rows = 0
+        self.found = 0
+        # (id, название, было, стало)
+        self.changes: list[tuple[int, str, int, int]] = []
+        # строки, для которых товар не найден: (line, product_id, name)
+        self.missing: list[tuple[int, Optional[int], Optional[str]]] = []
+        self.failed = 0
+        # первые MAX_ERRORS ошибок в строках: (номер строки, описание)
+        self.errors: list[tuple[int, str]] = []
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+Progress = Callable[[SyncReport], Awaitable]
+
+
+def read_stock(path: str, report: SyncReport) -> Iterator[StockRow]:
+    """
+    Строки остатков из файла CSV или XLSX с колонками id (или product_id),
+    name и quantity. Строки с ошибками попадают в report
+    """
+    for line, record in read_rows(path, required=('quantity',)):
+        try:
+            product_id = record.get('id') or record.get('product_id')
+            name = str(record.get('name') or '').strip()[:MAX_LENGTH] or None
+            if product_id is None and name is None:
+                raise ValueError('id or name is required')
+
+            yield StockRow(line, parse_count(product_id, 'id') if product_id else None,
+                           name, parse_count(record.get('quantity'), 'quantity'))
+        except ValueError as e:
+            report.rows += 1
+            report.add_error(line, str(e))
+
+
+async def sync_stock(rows: Iterable[StockRow], report: Optional[SyncReport] = None,
+                     batch_size: int = STOCK_SYNC_BATCH_SIZE, dry_run: bool = False,
+                     progress: Optional[Progress] = None) -> SyncReport:
+    """
+    Применяет остатки пачками, каждая пачка в своей транзакции.
+    dry_run - только посчитать изменения. progress(report) вызывается после пачки
+    """
+    db = DBManager()
+    report = report if report is not None else SyncReport()
+    batch: list[StockRow] = []
+
+    async def flush() -> None:
+        changes, missing, found = await db.sync_stock(batch, dry_run=dry_run)
+        report.changes.extend(changes)
+        report.missing.extend(missing)
+        report.found += found
+        batch.clear()
+        if progress is not None:
+            await progress(report)
+
+    token = current_unit_of_work.set(None)
+    try:
+        for row in rows:
+            report.rows += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await flush()
+
+        if batch:
+            await flush()
+    finally:
+        current_unit_of_work.reset(token)
+    return report
@@ -1 +1 @@
-from .models.models import Category, Product, Order, Base
\ No newline at end of file
+from .models.models import Category, Product, Order, FSMState, Base
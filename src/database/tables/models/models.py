@@ -1,5 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Integer, String, Boolean, TIMESTAMP, ForeignKey, Float
+from decimal import Decimal
+from sqlalchemy import Integer, BigInteger, String, Boolean, TIMESTAMP, ForeignKey, Numeric, \
+    UniqueConstraint, Index, JSON, CheckConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 
@@ -17,6 +20,9 @@ class Category(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True, unique=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[TIMESTAMP] = mapped_column(TIMESTAMP, default=datetime.now())
+    # число товаров категории, поддерживается триггерами на таблице product
+    product_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0,
+                                               server_default='0')
     products = relationship('Product', back_populates='category', cascade='delete,all')
 
     def __str__(self):
@@ -26,12 +32,26 @@ class Category(Base):
 class Product(Base):
 
     __tablename__ = 'product'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # индексы триграмм pg_trgm для inline-поиска товаров
+        Index('ix_product_name_trgm', 'name',
+              postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_product_title_trgm', 'title',
+              postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        # товары категории: списки, подсчет и страницы каталога по ключу id
+        Index('ix_product_category_id_id', 'category_id', 'id'),
+        # ключ товара в каталоге: название уникально внутри категории
+        UniqueConstraint('category_id', 'name', name='uq_product_category_name'),
+        # остаток на складе не может уйти в минус
+        CheckConstraint('quantity >= 0', name='ck_product_quantity_non_negative'),
+        {'extend_existing': True}
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
-    price: Mapped[float] = mapped_column(Float, nullable=False)
+    # цена в гривнах с точностью до копейки, без ошибок округления float
+    price: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[TIMESTAMP] = mapped_column(TIMESTAMP, default=datetime.now())
@@ -46,14 +66,40 @@ class Product(Base):
 class Order(Base):
 
     __tablename__ = 'order'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # корзина пользователя: одна позиция на товар
+        UniqueConstraint('user_id', 'product_id', name='uq_order_user_product'),
+        # позиции корзины в порядке добавления
+        Index('ix_order_user_id_id', 'user_id', 'id'),
+        # позиции заказов с товаром (проверка внешнего ключа при удалении товара)
+        Index('ix_order_product_id', 'product_id'),
+        # пустая позиция удаляется, а не хранится с нулевым количеством
+        CheckConstraint('quantity >= 1', name='ck_order_quantity_positive'),
+        {'extend_existing': True}
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     data: Mapped[TIMESTAMP] = mapped_column(TIMESTAMP)
     product_id: Mapped[int] = mapped_column(ForeignKey('product.id'))
-    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     product = relationship(Product, back_populates='orders')
 
     def __str__(self):
-        return f'{self.quantity}-{self.data}'
\ No newline at end of file
+        return f'{self.quantity}-{self.data}'
+
+
+class FSMState(Base):
+    """Состояние FSM aiogram (машины состояний диалога) для пользователя в чате"""
+
+    __tablename__ = 'fsm_state'
+    __table_args__ = {'extend_existing': True}
+
+    chat: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON().with_variant(JSONB, 'postgresql'), nullable=False)
+    updated_at: Mapped[TIMESTAMP] = mapped_column(TIMESTAMP, nullable=False, index=True)
+
+    def __str__(self):
+        return f'{self.chat}-{self.user}-{self.state}'
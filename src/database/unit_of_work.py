@@ -0,0 +1,75 @@
+from contextvars import ContextVar
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWork:
+    """
+    Единица работы в рамках обработки одного апдейта Telegram.
+    Все обращения к бд используют одну сессию и одну транзакцию,
+    которая фиксируется один раз в конце обработки (или раньше,
+    см. commit_unit_of_work) либо откатывается при ошибке
+    """
+
+    def __init__(self, db_engine):
+        self.__db_engine = db_engine
+        self.__session: Optional[AsyncSession] = None
+        self.__on_commit: list[Callable[[], None]] = []
+        self.closed = False
+
+    async def get_session(self) -> AsyncSession:
+        """Возвращает сессию, открывая её при первом обращении к бд"""
+        if self.__session is None:
+            self.__session = self.__db_engine.session_maker()
+            await self.__session.begin()
+        return self.__session
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Регистрирует действие, которое выполнится после успешной фиксации"""
+        self.__on_commit.append(callback)
+
+    async def commit(self) -> None:
+        """Фиксирует транзакцию, закрывает сессию и выполняет действия после фиксации"""
+        if self.closed:
+            return
+        try:
+            if self.__session is not None:
+                await self.__session.commit()
+        finally:
+            await self.close()
+
+        for callback in self.__on_commit:
+            callback()
+
+    async def rollback(self) -> None:
+        """Откатывает транзакцию и закрывает сессию"""
+        if self.closed:
+            return
+        try:
+            if self.__session is not None:
+                await self.__session.rollback()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        self.closed = True
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+
+# единица работы текущего апдейта, у каждой задачи asyncio своя
+current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    'current_unit_of_work', default=None
+)
+
+
+async def commit_unit_of_work() -> None:
+    """
+    Досрочно фиксирует единицу работы текущего апдейта: обработчик вызывает
+    её перед запросами к Telegram, чтобы не держать блокировки строк на время
+    сетевого запроса. Последующие обращения к бд идут в своих транзакциях
+    """
+    unit_of_work = current_unit_of_work.get()
+    if unit_of_work is not None:
+        await unit_of_work.commit()
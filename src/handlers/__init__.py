@@ -1,2 +1,3 @@
+from .router import CallbackRouter
 from .handler import Handler
 from .handler_main import HandlerMain
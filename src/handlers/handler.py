@@ -2,6 +2,7 @@ import abc
 from aiogram import Bot, Dispatcher
 from keyboards import Keyboards
 from database import DBManager
+from .router import CallbackRouter
 
 
 class Handler(metaclass=abc.ABCMeta):
@@ -11,6 +12,7 @@ class Handler(metaclass=abc.ABCMeta):
         self.dp = dp
         self.keyboards = Keyboards()
         self.BD = DBManager()
+        self.router = CallbackRouter.of(dp)
 
     @abc.abstractmethod
     def register_handler(self):
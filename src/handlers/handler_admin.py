@@ -1,13 +1,19 @@
 import logging
+import os
+import tempfile
+from contextlib import suppress
 from functools import wraps
 from aiogram import Bot, Dispatcher
 from aiogram.dispatcher import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, ContentType, InputFile
+from aiogram.utils.exceptions import MessageNotModified
+from aiogram.utils.markdown import quote_html
 from aiogram.dispatcher.filters.state import StatesGroup, State
 from sqlalchemy.exc import IntegrityError
 
 from handlers import Handler
-from config import MESSAGES, IS_ADMIN_ID
+from config import MESSAGES, IS_ADMIN_ID, parse_money, format_money
+from database import ImportReport, commit_unit_of_work, import_catalog, export_catalog
 
 
 # ********** FSM Aiogram **********
@@ -23,6 +29,10 @@ class AddProduct(StatesGroup):
     quantity = State()
 
 
+class ImportCatalog(StatesGroup):
+    document = State()
+
+
 # ********** DECORATORS **********
 def is_admin(func):
     @wraps(func)
@@ -94,6 +104,10 @@ class HandlerAdmin(Handler):
             await callback.answer('Добавление товара отменено')
             await self.pressed_start_admin(callback)
 
+        elif callback.data.split('_', maxsplit=1)[1] == 'import_catalog':
+            await callback.answer('Импорт каталога отменен')
+            await self.pressed_start_admin(callback)
+
     async def pressed_back_btn(self, callback: CallbackQuery) -> None:
         """Реализует возврат"""
 
@@ -145,17 +159,19 @@ class HandlerAdmin(Handler):
 
     # ********** START View All CATEGORY **********
 
-    async def view_all_categories(self, callback: CallbackQuery) -> None:
+    async def view_all_categories(self, callback: CallbackQuery, cursor: int = 0) -> None:
         """Просмотр всех категорий"""
 
-        self.__CONST_MARKUP = callback.data
+        if not cursor:
+            # листание страниц не меняет режим просмотра
+            self.__CONST_MARKUP = callback.data
 
-        categories = await self.BD.all_categories()
+        page = await self.BD.categories_page(cursor)
 
-        if categories:
+        if page.items:
             await callback.message.edit_text(
                 MESSAGES.get('choices_category').format(callback.from_user.first_name),
-                reply_markup=self.keyboards.category_menu(*categories, role='admin')
+                reply_markup=self.keyboards.category_menu(page, role='admin')
             )
         else:
             await callback.message.edit_text(
@@ -164,28 +180,33 @@ class HandlerAdmin(Handler):
             )
         await callback.answer()
 
-    async def view_only_category(self, callback: CallbackQuery) -> None:
+    async def view_only_category(self, callback: CallbackQuery, category_id: int = None,
+                                 cursor: int = 0) -> None:
         """Просмотр информации о категории а также ряд действий над ней"""
 
-        if callback.data.split('_')[-1].isdigit():
-            self.__CURRENT_CAT_ID = int(callback.data.split('_')[-1])
+        if category_id is not None:
+            self.__CURRENT_CAT_ID = category_id
 
-        count_products = await self.BD.get_count_products(self.__CURRENT_CAT_ID)
         category = await self.BD.get_category(self.__CURRENT_CAT_ID)
-        all_products_category = await self.BD.all_products(self.__CURRENT_CAT_ID)
+        if category is None:
+            await callback.answer(MESSAGES.get('category_not_found'), show_alert=True)
+            await self.view_all_categories(callback)
+            return
 
         # Настройки для вывода reply_markup
         match self.__CONST_MARKUP:
             case 'list_category':
                 reply_markup = self.keyboards.view_only_category_menu(self.__CURRENT_CAT_ID)
             case _:
-                reply_markup = self.keyboards.view_all_products(*all_products_category, role='admin')
+                page = await self.BD.products_page(self.__CURRENT_CAT_ID, cursor)
+                reply_markup = self.keyboards.view_all_products(
+                    page, self.__CURRENT_CAT_ID, role='admin')
         await callback.message.edit_text(
             MESSAGES.get('view_category').format(
                 category_name=category.name,
                 category_id=category.id,
                 category_is_active=category.is_active,
-                category_count=count_products
+                category_count=category.product_count
             ),
             reply_markup=reply_markup
         )
@@ -195,13 +216,13 @@ class HandlerAdmin(Handler):
 
     # ********** DELETE CATEGORY **********
 
-    async def delete_category(self, callback: CallbackQuery) -> None:
+    async def delete_category(self, callback: CallbackQuery, category_id: int) -> None:
         """Удаление категории"""
 
-        category_id = int(callback.data.split('_')[-1])
-
         try:
             await self.BD.delete_category(category_id)
+            # кэш каталога сбрасывается при фиксации, меню ниже читает его заново
+            await commit_unit_of_work()
             await callback.answer(MESSAGES.get('delete_category'))
             await self.view_all_categories(callback)
 
@@ -216,20 +237,22 @@ class HandlerAdmin(Handler):
     async def start_add_product(self, callback: CallbackQuery) -> None:
         """Старт для добавления нового товара"""
         await AddProduct.category_id.set()
-        categories = await self.BD.all_categories()
+        await self.select_product_category(callback)
+
+    async def select_product_category(self, callback: CallbackQuery, cursor: int = 0) -> None:
+        """Выбор категории для нового товара"""
+        page = await self.BD.categories_page(cursor)
 
         await callback.message.edit_text(
             MESSAGES.get('select_category').format(callback.from_user.first_name),
-            reply_markup=self.keyboards.category_menu(*categories, role='admin', action='cancel')
+            reply_markup=self.keyboards.category_menu(page, role='admin', action='cancel')
         )
         await callback.answer()
 
-    async def write_product_category_id(self, callback: CallbackQuery,
+    async def write_product_category_id(self, callback: CallbackQuery, category_id: int,
                                         state: FSMContext) -> None:
         """Запись выбранной категории"""
 
-        category_id = int(callback.data.split('_')[-1])
-
         async with state.proxy() as data:
             data.setdefault('category_id', category_id)
 
@@ -286,14 +309,14 @@ class HandlerAdmin(Handler):
                 title=data['title'],
                 category_name=category.name,
                 name=data['name'],
-                price=float(data['price']),
+                price=format_money(parse_money(data['price'])),
                 quantity=data['quantity']
             ),
             reply_markup=self.keyboards.preview_product()
         )
 
         self.__data_product.update(title=data.get('title'), category_id=int(data.get('category_id')),
-                                   name=data.get('name'), price=float(data.get('price')),
+                                   name=data.get('name'), price=parse_money(data.get('price')),
                                    quantity=int(data.get('quantity')))
 
         await state.finish()
@@ -324,11 +347,9 @@ class HandlerAdmin(Handler):
 
     # ********** VIEW PRODUCT **********
 
-    async def view_only_product(self, callback: CallbackQuery) -> None:
+    async def view_only_product(self, callback: CallbackQuery, product_id: int) -> None:
         """Просмотр конкретного продукта"""
 
-        product_id = int(callback.data.split('_')[-1])
-
         current_product = await self.BD.get_product(product_id)
         category = await self.BD.get_category(current_product.category_id)
 
@@ -337,7 +358,7 @@ class HandlerAdmin(Handler):
                 title=current_product.title,
                 category_name=category.name,
                 name=current_product.name,
-                price=current_product.price,
+                price=format_money(current_product.price),
                 quantity=current_product.quantity
             ),
             reply_markup=self.keyboards.view_only_product(product_id)
@@ -346,13 +367,13 @@ class HandlerAdmin(Handler):
         await callback.answer()
 
     # ********** DELETE PRODUCT **********
-    async def delete_product(self, callback: CallbackQuery):
+    async def delete_product(self, callback: CallbackQuery, product_id: int):
         """Удаление товара"""
 
-        product_id = int(callback.data.split('_')[-1])
-
         try:
             await self.BD.delete_product(product_id)
+            # кэш каталога сбрасывается при фиксации, меню ниже читает его заново
+            await commit_unit_of_work()
             await callback.answer(MESSAGES.get('delete_product'))
             await self.pressed_start_admin(callback)
 
@@ -361,38 +382,114 @@ class HandlerAdmin(Handler):
             await callback.answer(MESSAGES.get('delete_product_failed'))
             await self.pressed_start_admin(callback)
 
+    # ********** IMPORT / EXPORT CATALOG **********
+
+    async def start_import_catalog(self, callback: CallbackQuery) -> None:
+        """Старт загрузки каталога из файла"""
+
+        await ImportCatalog.document.set()
+        await self.__cancel_answer(
+            callback, MESSAGES.get('import_catalog'), 'import_catalog')
+
+        await callback.answer()
+
+    @staticmethod
+    def __import_counters(report: ImportReport) -> dict:
+        return dict(rows=report.rows, created=report.created,
+                    updated=report.updated, failed=report.failed)
+
+    @is_admin
+    async def upload_catalog(self, message: Message, state: FSMContext) -> None:
+        """Загрузка каталога из присланного файла CSV или XLSX"""
+
+        file_name = message.document.file_name if message.document else None
+        extension = os.path.splitext(file_name or '')[1].lower()
+        if extension not in ('.csv', '.xlsx'):
+            await self.__cancel_answer(
+                message, MESSAGES.get('import_wrong_file'), 'import_catalog')
+            return
+        await state.finish()
+
+        status = await message.answer(
+            MESSAGES.get('import_progress').format(rows=0, created=0, updated=0, failed=0))
+
+        async def progress(report: ImportReport) -> None:
+            with suppress(MessageNotModified):
+                await status.edit_text(
+                    MESSAGES.get('import_progress').format(**self.__import_counters(report)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog' + extension)
+            await message.document.download(destination_file=path)
+            try:
+                report = await import_catalog(path, progress)
+            except ValueError as e:
+                await status.edit_text(
+                    MESSAGES.get('import_failed').format(quote_html(str(e))),
+                    reply_markup=self.keyboards.start_admin_menu()
+                )
+                return
+
+        logging.info(f'Catalog imported by {message.from_user.id}: '
+                     f'{self.__import_counters(report)}')
+        errors = ''.join(
+            MESSAGES.get('import_error').format(line=line, error=quote_html(error))
+            for line, error in report.errors
+        )
+        await status.edit_text(
+            MESSAGES.get('import_done').format(errors=errors, **self.__import_counters(report)),
+            reply_markup=self.keyboards.start_admin_menu()
+        )
+
+    @is_admin
+    async def send_catalog_export(self, callback: CallbackQuery) -> None:
+        """Выгрузка каталога в CSV файл"""
+
+        await callback.answer()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            # BOM - чтобы Excel открыл файл в utf-8
+            with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+                count = await export_catalog(file)
+
+            await callback.message.answer_document(
+                InputFile(path, filename='catalog.csv'),
+                caption=MESSAGES.get('export_catalog').format(count)
+            )
+
+    # ********** END IMPORT / EXPORT CATALOG **********
+
     def register_handler(self):
 
         # ********** OTHER FUNCTIONS **********
 
         self.dp.register_message_handler(self.pressed_start_admin, commands=['admin'])
-        self.dp.register_callback_query_handler(self.cancel_all_operation,
-                                                lambda c: c.data.startswith('cancel'),
-                                                state='*')
-        self.dp.register_callback_query_handler(self.pressed_back_btn,
-                                                lambda c: c.data.startswith('back'))
+        self.router.route('cancel_add_category', self.cancel_all_operation, state='*')
+        self.router.route('cancel_add_product', self.cancel_all_operation, state='*')
+        self.router.route('cancel_import_catalog', self.cancel_all_operation, state='*')
+        self.router.route('back_to_admin', self.pressed_back_btn)
+        self.router.route('back_to_category_list', self.pressed_back_btn)
+        self.router.route('back_to_product_list', self.pressed_back_btn)
 
         # ********** OPERATIONS WITH CATEGORIES **********
 
-        self.dp.register_callback_query_handler(self.start_add_new_category,
-                                                lambda c: c.data == 'add_category',
-                                                state=None)
+        self.router.route('add_category', self.start_add_new_category)
         self.dp.register_message_handler(self.add_category, state=AddCategory.category_name)
 
-        self.dp.register_callback_query_handler(self.view_all_categories,
-                                                lambda c: c.data.startswith('list_'))
-        self.dp.register_callback_query_handler(self.view_only_category,
-                                                lambda c: c.data.startswith('only_cat'))
-        self.dp.register_callback_query_handler(self.delete_category,
-                                                lambda c: c.data.startswith('delete_category'))
+        self.router.route('list_category', self.view_all_categories)
+        self.router.route('list_product', self.view_all_categories)
+        self.router.route('admin_categories_page', self.view_all_categories, int)
+        self.router.route('only_cat', self.view_only_category, int)
+        self.router.route('admin_products_page', self.view_only_category, int, int)
+        self.router.route('delete_category', self.delete_category, int)
 
         # ********** OPERATIONS WITH PRODUCTS **********
 
-        self.dp.register_callback_query_handler(self.start_add_product,
-                                                lambda c: c.data == 'add_product',
-                                                state=None)
-        self.dp.register_callback_query_handler(self.write_product_category_id,
-                                                state=AddProduct.category_id)
+        self.router.route('add_product', self.start_add_product)
+        self.router.route('only_cat', self.write_product_category_id, int,
+                          state=AddProduct.category_id)
+        self.router.route('select_categories_page', self.select_product_category, int,
+                          state=AddProduct.category_id)
         self.dp.register_message_handler(self.write_product_name,
                                          state=AddProduct.name)
         self.dp.register_message_handler(self.write_product_title,
@@ -401,12 +498,14 @@ class HandlerAdmin(Handler):
                                          state=AddProduct.price)
         self.dp.register_message_handler(self.write_quantity,
                                          state=AddProduct.quantity)
-        self.dp.register_callback_query_handler(
-            self.save_or_cancel_product,
-            lambda c: c.data.startswith('repeal_save') | c.data.startswith('save'))
-        self.dp.register_callback_query_handler(
-            self.view_only_product, lambda c: c.data.startswith('product_')
-        )
-        self.dp.register_callback_query_handler(
-            self.delete_product, lambda c: c.data.startswith('delete_product'))
+        self.router.route('save_product', self.save_or_cancel_product)
+        self.router.route('repeal_save_product', self.save_or_cancel_product)
+        self.router.route('product', self.view_only_product, int)
+        self.router.route('delete_product', self.delete_product, int)
+
+        # ********** IMPORT / EXPORT CATALOG **********
 
+        self.router.route('import_catalog', self.start_import_catalog)
+        self.dp.register_message_handler(self.upload_catalog, content_types=ContentType.ANY,
+                                         state=ImportCatalog.document)
+        self.router.route('export_catalog', self.send_catalog_export)
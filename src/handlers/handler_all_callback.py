@@ -1,9 +1,11 @@
+import logging
 from contextlib import suppress
 from aiogram import Bot, Dispatcher
 from aiogram.types import CallbackQuery
 from aiogram.utils.exceptions import MessageNotModified
 from handlers import Handler
-from config import MESSAGES, KEYBOARD, Utils
+from config import MESSAGES, Utils, format_money
+from database import CartBuffer, commit_unit_of_work
 
 
 class HandlerAllCallback(Handler):
@@ -11,15 +13,24 @@ class HandlerAllCallback(Handler):
 
     def __init__(self, bot: Bot, dp: Dispatcher):
         super().__init__(bot, dp)
-        self.step = 0  # шаг в заказе
-        self.__AMOUNT_ORDERS = None
         self.utils = Utils(self.BD)
+        self.cart = CartBuffer()
 
-    async def __back_next_step(self, callback: CallbackQuery) -> None:
+    async def __back_next_step(self, callback: CallbackQuery, step: int) -> None:
+        await self.cart.flush(callback.from_user.id)
+        count = await self.BD.select_all_product_id(callback.from_user.id)
+
+        if not count:
+            await callback.answer(
+                MESSAGES.get('no_orders').format(callback.from_user.first_name),
+                show_alert=True
+            )
+            return
+
+        step = max(min(step, len(count) - 1), 0)
         with suppress(MessageNotModified):
-            count = await self.BD.select_all_product_id()
-            quantity_order = await self.BD.select_order_quantity(count[self.step])
-            await self.send_callback_order(callback, count[self.step], quantity_order, self.__AMOUNT_ORDERS)
+            quantity_order = await self.BD.select_order_quantity(callback.from_user.id, count[step])
+            await self.send_callback_order(callback, count[step], quantity_order, step, len(count))
 
         await callback.answer()
 
@@ -56,30 +67,37 @@ class HandlerAllCallback(Handler):
         )
         await callback.answer('Вы вернулись назад')
 
-    async def all_category(self, callback: CallbackQuery) -> None:
+    async def all_category(self, callback: CallbackQuery, cursor: int = 0) -> None:
         """
         Обработка события нажатия на кнопку 'Выбрать товар'. А точне
         это выбор категории товаров
         """
-        categories = await self.BD.all_categories()
+        page = await self.BD.categories_page(cursor)
 
         await callback.message.edit_text(
             MESSAGES.get('choices_category').format(callback.from_user.first_name),
-            reply_markup=self.keyboards.category_menu(*categories)
+            reply_markup=self.keyboards.category_menu(page)
         )
         await callback.answer()
 
-    async def view_all_product(self, callback: CallbackQuery) -> None:
+    async def view_all_product(self, callback: CallbackQuery, category_id: int,
+                               cursor: int = 0) -> None:
         """
         Обработка события нажатия на кнопку 'Выбрать товар'. А точнее
         это выбор товара из категории
         """
-        category_id = int(callback.data.split('_')[-1])
-        all_products = await self.BD.all_products(category_id)
+        category = await self.BD.get_category(category_id)
+        if category is None:
+            # клавиатура устарела: категорию уже удалили
+            await callback.answer(MESSAGES.get('category_not_found'), show_alert=True)
+            await self.all_category(callback)
+            return
+
+        page = await self.BD.products_page(category_id, cursor)
 
         await callback.message.edit_text(
-            'Категория ' + KEYBOARD.get(f'{callback.data.split("_")[2]}'),
-            reply_markup=self.keyboards.view_all_products(*all_products, role='client')
+            f'Категория {category.name}',
+            reply_markup=self.keyboards.view_all_products(page, category_id, role='client')
         )
         await callback.answer()
 
@@ -87,16 +105,13 @@ class HandlerAllCallback(Handler):
     async def pressed_btn_order(self, callback: CallbackQuery) -> None:
         """Обрабатывает входящие нажатия на кнопку 'Заказ'"""
 
-        self.__AMOUNT_ORDERS = await self.BD.count_rows_order()
-
-        self.step = 0
-
-        with suppress(IndexError):
-            count = await self.BD.select_all_product_id()
-            quantity = await self.BD.select_order_quantity(count[self.step])
+        step = 0
+        await self.cart.flush(callback.from_user.id)
+        count = await self.BD.select_all_product_id(callback.from_user.id)
 
-        if self.__AMOUNT_ORDERS:
-            await self.send_callback_order(callback, count[self.step], quantity, self.__AMOUNT_ORDERS)
+        if count:
+            quantity = await self.BD.select_order_quantity(callback.from_user.id, count[step])
+            await self.send_callback_order(callback, count[step], quantity, step, len(count))
         else:
             await callback.answer(
                 MESSAGES.get('no_orders').
@@ -106,83 +121,102 @@ class HandlerAllCallback(Handler):
 
     async def send_callback_order(
             self, callback: CallbackQuery, product_id: int, quantity: int,
-            amount_orders: int = None
+            step: int, amount_orders: int = None
     ) -> None:
         """Отправляет в ответ пользователю его текущий заказ"""
+        await self.__render_order(callback, product_id, quantity, step, amount_orders)
+        await callback.answer()
+
+    async def __render_order(
+            self, callback: CallbackQuery, product_id: int, quantity: int,
+            step: int, amount_orders: int = None
+    ) -> None:
+        """Обновляет сообщение с текущей позицией заказа"""
         current_order_product = await self.BD.get_product(product_id)
 
         await callback.message.edit_text(
             MESSAGES.get('order').format(
-                self.step + 1,
+                step + 1,
                 current_order_product.name,
                 current_order_product.title,
-                current_order_product.price,
+                format_money(current_order_product.price),
                 quantity
             ),
-            reply_markup=self.keyboards.orders_menu(self.step, quantity, amount_orders)
+            reply_markup=self.keyboards.orders_menu(step, quantity, amount_orders)
         )
 
-        await callback.answer()
+    def __order_renderer(self, callback: CallbackQuery, product_id: int,
+                         step: int, amount_orders: int):
+        """Функция отрисовки позиции заказа для CartBuffer"""
 
-    async def pressed_btn_up(self, callback: CallbackQuery) -> None:
+        async def render(quantity: int) -> None:
+            with suppress(MessageNotModified):
+                await self.__render_order(callback, product_id, quantity, step, amount_orders)
+
+        return render
+
+    async def pressed_btn_up(self, callback: CallbackQuery, step: int) -> None:
         """
         Обработка нажатия кнопки увеличения
         количества определенного товара в заказе
         """
 
-        count = await self.BD.select_all_product_id()
-        quantity_order = await self.BD.select_order_quantity(count[self.step])
-
-        quantity_product = await self.BD.select_product_quantity(count[self.step])
-
-        if quantity_product > 0:
-            quantity_order += 1; quantity_product -= 1
+        count = await self.BD.select_all_product_id(callback.from_user.id)
+        if not count:
+            await self.pressed_btn_order(callback)
+            return
+        step = min(step, len(count) - 1)
 
-            await self.BD.update_order_value(count[self.step], quantity_order)
-            await self.BD.update_product_value(count[self.step], quantity_product)
+        quantity_order = await self.cart.adjust(
+            callback.from_user.id, count[step], 1,
+            self.__order_renderer(callback, count[step], step, len(count))
+        )
+        if quantity_order is None:
+            await callback.answer(MESSAGES.get('out_of_stock'), show_alert=True)
+            return
 
-        await self.send_callback_order(callback, count[self.step], quantity_order, self.__AMOUNT_ORDERS)
+        await callback.answer()
 
-    async def pressed_btn_down(self, callback: CallbackQuery) -> None:
+    async def pressed_btn_down(self, callback: CallbackQuery, step: int) -> None:
         """
-        Обработка нажатия кнопки увеличения
+        Обработка нажатия кнопки уменьшения
         количества определенного товара в заказе
         """
 
-        count = await self.BD.select_all_product_id()
-        quantity_order = await self.BD.select_order_quantity(count[self.step])
+        count = await self.BD.select_all_product_id(callback.from_user.id)
+        if not count:
+            await self.pressed_btn_order(callback)
+            return
+        step = min(step, len(count) - 1)
 
-        quantity_product = await self.BD.select_product_quantity(count[self.step])
-
-        with suppress(MessageNotModified):
-            if quantity_product > 0 and quantity_order > 1:
-                quantity_order -= 1; quantity_product += 1
-
-                await self.BD.update_order_value(count[self.step], quantity_order)
-                await self.BD.update_product_value(count[self.step], quantity_product)
+        quantity_order = await self.cart.adjust(
+            callback.from_user.id, count[step], -1,
+            self.__order_renderer(callback, count[step], step, len(count))
+        )
+        if quantity_order is None:
+            await callback.answer(MESSAGES.get('min_order_quantity'))
+            return
 
-            await self.send_callback_order(callback, count[self.step], quantity_order, self.__AMOUNT_ORDERS)
         await callback.answer()
 
-    async def pressed_btn_x(self, callback: CallbackQuery) -> None:
+    async def pressed_btn_x(self, callback: CallbackQuery, step: int) -> None:
         """Обрабатывает нажатие кнопки удаления товара в заказе"""
 
-        count = await self.BD.select_all_product_id()
+        await self.cart.flush(callback.from_user.id)
+        count = await self.BD.select_all_product_id(callback.from_user.id)
 
         if len(count) > 0:
-            quantity_order = await self.BD.select_order_quantity(count[self.step])
-            quantity_product = await self.BD.select_product_quantity(count[self.step])
+            step = min(step, len(count) - 1)
+            # позицию могли удалить параллельно, тогда возвращать на склад нечего
+            await self.BD.remove_from_order(callback.from_user.id, count[step])
+            await commit_unit_of_work()
+            step = max(step - 1, 0)
 
-            quantity_product += quantity_order
-            await self.BD.delete_product_order(count[self.step])
-            await self.BD.update_product_value(count[self.step], quantity_product)
-            self.step -= 1
-
-        count = await self.BD.select_all_product_id()
+        count = await self.BD.select_all_product_id(callback.from_user.id)
         if len(count) > 0:
-            self.__AMOUNT_ORDERS = await self.BD.count_rows_order()
-            quantity_order = await self.BD.select_order_quantity(count[self.step])
-            await self.send_callback_order(callback, count[self.step], quantity_order, self.__AMOUNT_ORDERS)
+            step = min(step, len(count) - 1)
+            quantity_order = await self.BD.select_order_quantity(callback.from_user.id, count[step])
+            await self.send_callback_order(callback, count[step], quantity_order, step, len(count))
         else:
             await callback.answer(
                 MESSAGES.get('no_orders').
@@ -191,28 +225,25 @@ class HandlerAllCallback(Handler):
             )
             await self.all_category(callback)
 
-    async def pressed_btn_back_step(self, callback: CallbackQuery) -> None:
+    async def pressed_btn_back_step(self, callback: CallbackQuery, step: int) -> None:
         """
         Обрабатывает нажатие кнопки перемещения
         на предыдущую позицию товара в заказе
         """
-        if self.step > 0: self.step -= 1
-
-        await self.__back_next_step(callback)
+        await self.__back_next_step(callback, step - 1)
 
-    async def pressed_btn_next_step(self, callback: CallbackQuery) -> None:
+    async def pressed_btn_next_step(self, callback: CallbackQuery, step: int) -> None:
         """
         Обрабатывает нажатие кнопки перемещения
         на следующую позицию товара в заказе
         """
-        if self.step < self.__AMOUNT_ORDERS - 1: self.step += 1
-
-        await self.__back_next_step(callback)
+        await self.__back_next_step(callback, step + 1)
 
     async def pressed_btn_apply(self, callback: CallbackQuery) -> None:
         """
         Oбрабатывает нажатия на кнопку 'Оформить заказ'
         """
+        await self.cart.flush(callback.from_user.id)
         await callback.message.edit_text(
             MESSAGES.get('select_payments').format(
                 callback.from_user.first_name
@@ -224,39 +255,36 @@ class HandlerAllCallback(Handler):
         """
         Обрабатывает нажатие кнопки ('При получении')
         """
+        await self.cart.flush(callback.from_user.id)
+        total_coast, total_quantity = await self.utils.get_totals(callback.from_user.id)
+        removed = await self.BD.delete_order_all(callback.from_user.id)
+        # заказ фиксируется до запросов к Telegram, блокировки строк не ждут сеть
+        await commit_unit_of_work()
+        logging.info(f'Order of user {callback.from_user.id} is placed: '
+                     f'{[(row.product_id, row.quantity) for row in removed]}')
+
         await callback.message.edit_text(
-            MESSAGES.get('apply').format(
-                await self.utils.get_total_coast(),
-                await self.utils.get_total_quantity()
-            ), reply_markup=self.keyboards.back()
+            MESSAGES.get('apply').format(format_money(total_coast), total_quantity),
+            reply_markup=self.keyboards.back()
         )
-        await self.BD.delete_order_all()
         await callback.answer()
 
     def register_handler(self):
         # *********** Главное меню **********
-        self.dp.register_callback_query_handler(
-            self.pressed_btn_info, lambda c: c.data == 'info'
-        )
-        self.dp.register_callback_query_handler(
-            self.pressed_btn_settings, lambda c: c.data == 'settings'
-        )
-        self.dp.register_callback_query_handler(
-            self.pressed_btn_back, lambda c: c.data == 'back'
-        )
-        self.dp.register_callback_query_handler(
-            self.all_category, lambda c: c.data == 'choose_goods'
-        )
-
-        self.dp.register_callback_query_handler(
-            self.view_all_product,
-            lambda c: c.data.startswith('select_cat')
-        )
-        self.dp.register_callback_query_handler(self.pressed_btn_order, lambda c: c.data == 'order')
-        self.dp.register_callback_query_handler(self.pressed_btn_up, lambda c: c.data == 'up')
-        self.dp.register_callback_query_handler(self.pressed_btn_down, lambda c: c.data == 'down')
-        self.dp.register_callback_query_handler(self.pressed_btn_x, lambda c: c.data == 'remove')
-        self.dp.register_callback_query_handler(self.pressed_btn_back_step, lambda c: c.data == 'back_step')
-        self.dp.register_callback_query_handler(self.pressed_btn_next_step, lambda c: c.data == 'next_step')
-        self.dp.register_callback_query_handler(self.pressed_btn_apply, lambda c: c.data == 'apply')
-        self.dp.register_callback_query_handler(self.pressed_btn_post, lambda c: c.data == 'post')
+        self.router.route('info', self.pressed_btn_info)
+        self.router.route('settings', self.pressed_btn_settings)
+        self.router.route('back', self.pressed_btn_back)
+        self.router.route('choose_goods', self.all_category)
+        self.router.route('categories_page', self.all_category, int)
+        self.router.route('select_cat', self.view_all_product, int)
+        self.router.route('products_page', self.view_all_product, int, int)
+
+        # *********** Заказ **********
+        self.router.route('order', self.pressed_btn_order)
+        self.router.route('up', self.pressed_btn_up, int)
+        self.router.route('down', self.pressed_btn_down, int)
+        self.router.route('remove', self.pressed_btn_x, int)
+        self.router.route('back_step', self.pressed_btn_back_step, int)
+        self.router.route('next_step', self.pressed_btn_next_step, int)
+        self.router.route('apply', self.pressed_btn_apply)
+        self.router.route('post', self.pressed_btn_post)
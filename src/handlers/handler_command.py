@@ -40,10 +40,8 @@ class HandlerCommand(Handler):
 
     def register_handler(self):
         self.dp.register_message_handler(self.pressed_btn_start, commands=['start'])
-        self.dp.register_callback_query_handler(self.pressed_btn_help,
-                                                lambda c: c.data == 'help')
-        self.dp.register_callback_query_handler(self.pressed_btn_back_main_menu,
-                                                lambda c: c.data == 'main_menu')
+        self.router.route('help', self.pressed_btn_help)
+        self.router.route('main_menu', self.pressed_btn_back_main_menu)
 
 
 
@@ -1,27 +1,35 @@
 import logging
 
 from aiogram import Bot, Dispatcher
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineQuery, InlineQueryResultArticle, \
+    InputTextMessageContent
 from handlers import Handler
-from config import MESSAGES, KEYBOARD
+from config import MESSAGES, SEARCH_CACHE_TTL, format_money
+from database import commit_unit_of_work
 
 
 class HandlerInlineQuery(Handler):
     """
     Класс обрабатывает входящие текстовые
     сообщения от нажатия на инлайн-кнопоки
+    и inline-запросы поиска товаров (@bot <текст>)
     """
 
     def __init__(self, bot: Bot, dp: Dispatcher):
         super().__init__(bot, dp)
 
-    async def pressed_btn_product(self, callback: CallbackQuery) -> None:
+    async def pressed_btn_product(self, callback: CallbackQuery, product_id: int) -> None:
         """
         Обрабатывает входящие запросы на нажатие inline-кнопок товара
         """
-        product_id = int(callback.data.split('_')[-1])
         user_id = int(callback.from_user.id)
-        await self.BD.add_orders(1, product_id, user_id)
+        stock_left = await self.BD.add_orders(1, product_id, user_id)
+        # блокировки товара и позиции заказа не держим на время ответа Telegram
+        await commit_unit_of_work()
+
+        if stock_left is None:
+            await callback.answer(MESSAGES.get('out_of_stock'), show_alert=True)
+            return
 
         product = await self.BD.get_product(product_id)
         logging.info(f'Added product with order: {product.name}')
@@ -30,12 +38,39 @@ class HandlerInlineQuery(Handler):
             MESSAGES.get('product_order').format(
                 name=product.name,
                 title=product.title,
-                price=product.price,
+                price=format_money(product.price),
                 quantity=product.quantity
             ),
             show_alert=True
         )
 
+    async def search_products(self, query: InlineQuery) -> None:
+        """Обрабатывает inline-запросы поиска товаров по названию и описанию"""
+
+        products = await self.BD.search_products(query.query)
+
+        results = [
+            InlineQueryResultArticle(
+                id=str(product.id),
+                title=product.name,
+                description=MESSAGES.get('search_description').format(
+                    title=product.title, price=format_money(product.price)),
+                input_message_content=InputTextMessageContent(
+                    MESSAGES.get('search_result').format(
+                        name=product.name,
+                        title=product.title,
+                        price=format_money(product.price),
+                        quantity=product.quantity
+                    )
+                ),
+                reply_markup=self.keyboards.search_result(product.id)
+            )
+            for product in products
+        ]
+
+        # одинаковые запросы разных пользователей Telegram тоже отдает из своего кэша
+        await query.answer(results, cache_time=SEARCH_CACHE_TTL, is_personal=False)
+
     def register_handler(self):
-        self.dp.register_callback_query_handler(
-            self.pressed_btn_product, lambda c: c.data.startswith('client_product'))
\ No newline at end of file
+        self.router.route('client_product', self.pressed_btn_product, int)
+        self.dp.register_inline_handler(self.search_products, state='*')
@@ -0,0 +1,149 @@
+import inspect
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import Dispatcher
+from aiogram.dispatcher import FSMContext
+from aiogram.dispatcher.filters.state import State
+from aiogram.dispatcher.handler import SkipHandler
+from aiogram.types import CallbackQuery
+from keyboards import CallbackCodec
+
+
+class Route:
+    """Обработчик callback data и типы аргументов, которые он принимает"""
+
+    __slots__ = ('handler', 'arg_types', 'with_state')
+
+    def __init__(self, handler: Callable[..., Awaitable], arg_types: tuple):
+        self.handler = handler
+        self.arg_types = arg_types
+        self.with_state = 'state' in inspect.signature(handler).parameters
+
+    def parse(self, tokens: list[str]) -> Optional[list]:
+        """
+        Аргументы берутся из хвоста callback data. Токены между префиксом
+        и аргументами (например, название категории) пропускаются, а маршрут
+        без аргументов совпадает только с callback data целиком
+        """
+        if len(tokens) < len(self.arg_types) or (not self.arg_types and tokens):
+            return None
+
+        return self.convert(tokens[len(tokens) - len(self.arg_types):])
+
+    def convert(self, args: list) -> Optional[list]:
+        """Приводит аргументы к типам обработчика"""
+        if len(args) != len(self.arg_types):
+            return None
+
+        try:
+            return [arg_type(arg) for arg_type, arg in zip(self.arg_types, args)]
+        except ValueError:
+            return None
+
+
+class Node:
+    """Узел дерева префиксов callback data"""
+
+    __slots__ = ('children', 'route')
+
+    def __init__(self):
+        self.children: dict[str, Node] = {}
+        self.route: Optional[Route] = None
+
+
+class RouteTable:
+    """
+    Маршруты одного состояния FSM: словарь по коду действия
+    для компактной callback data и дерево префиксов для прежнего формата
+    """
+
+    __slots__ = ('compact', 'trie')
+
+    def __init__(self):
+        self.compact: dict[str, Route] = {}
+        self.trie = Node()
+
+
+class CallbackRouter:
+    """
+    Маршрутизатор callback-запросов. Компактная callback data (CallbackCodec)
+    декодируется и обработчик берется из словаря по коду действия.
+    Прочая callback data (статические кнопки и кнопки старых сообщений)
+    делится на токены по '_', обработчик выбирается по самому длинному
+    зарегистрированному префиксу в дереве префиксов. В обоих случаях стоимость
+    маршрутизации не растет с числом обработчиков. Для каждого состояния FSM
+    в aiogram регистрируется один обработчик; если маршрут не найден,
+    апдейт передается дальше
+    """
+
+    SEPARATOR = '_'
+
+    def __init__(self, dp: Dispatcher):
+        self.dp = dp
+        self.__tables: dict[Any, RouteTable] = {}
+
+    @classmethod
+    def of(cls, dp: Dispatcher) -> 'CallbackRouter':
+        """Возвращает общий маршрутизатор диспетчера"""
+        router = dp.get('callback_router')
+        if router is None:
+            router = dp['callback_router'] = cls(dp)
+        return router
+
+    def __table(self, state) -> RouteTable:
+        key = state.state if isinstance(state, State) else state
+        table = self.__tables.get(key)
+
+        if table is None:
+            table = self.__tables[key] = RouteTable()
+
+            async def dispatch(callback: CallbackQuery, state: FSMContext = None):
+                return await self.dispatch(table, callback, state)
+
+            self.dp.register_callback_query_handler(dispatch, state=state)
+
+        return table
+
+    def route(self, prefix: str, handler: Callable[..., Awaitable], *arg_types: type,
+              state=None) -> None:
+        """
+        Регистрирует обработчик для callback data, начинающейся с prefix,
+        а если prefix есть в таблице CallbackCodec - и для её компактного кода.
+        Значения arg_types передаются обработчику позиционными аргументами
+        """
+        table, route = self.__table(state), Route(handler, arg_types)
+
+        if prefix in CallbackCodec.ACTIONS:
+            table.compact[CallbackCodec.ACTIONS[prefix]] = route
+
+        node = table.trie
+        for token in prefix.split(self.SEPARATOR):
+            node = node.children.setdefault(token, Node())
+        node.route = route
+
+    def __match(self, table: RouteTable, data: str) -> tuple[Optional[Route], Optional[list]]:
+        decoded = CallbackCodec.decode(data)
+        if decoded is not None:
+            route = table.compact.get(decoded[0])
+            return route, route.convert(decoded[1]) if route is not None else None
+
+        tokens = data.split(self.SEPARATOR)
+
+        node, route, depth = table.trie, None, 0
+        for index, token in enumerate(tokens):
+            node = node.children.get(token)
+            if node is None:
+                break
+            if node.route is not None:
+                route, depth = node.route, index + 1
+
+        return route, route.parse(tokens[depth:]) if route is not None else None
+
+    async def dispatch(self, table: RouteTable, callback: CallbackQuery, state: FSMContext = None):
+        route, args = self.__match(table, callback.data)
+        if args is None:
+            raise SkipHandler()
+
+        if route.with_state:
+            return await route.handler(callback, *args, state=state)
+        return await route.handler(callback, *args)
@@ -1 +1,2 @@
-from .keyboards import Keyboards
\ No newline at end of file
+from .keyboards import Keyboards
+from .codec import CallbackCodec
@@ -0,0 +1,80 @@
+import string
+from typing import Optional
+
+
+class CallbackCodec:
+    """
+    Компактный формат callback data: '<версия><код действия>:<аргумент>:...'.
+    Аргументы - целые числа (id, страница, позиция в заказе) в base36,
+    названия категорий и товаров в callback data не передаются.
+    Например, 'select_cat' с id 1234 кодируется как '1e:ya'
+    """
+
+    VERSION = '1'
+    SEPARATOR = ':'
+    # лимит Telegram на размер callback data
+    MAX_SIZE = 64
+
+    # коды действий нельзя переиспользовать: кнопки старых сообщений остаются в чатах
+    ACTIONS = {
+        'select_cat': 'e',
+        'up': 'g',
+        'down': 'h',
+        'remove': 'i',
+        'back_step': 'j',
+        'next_step': 'k',
+        'client_product': 'p',
+        'only_cat': 'I',
+        'delete_category': 'J',
+        'product': 'N',
+        'delete_product': 'O',
+        'categories_page': 'q',
+        'products_page': 'r',
+        'admin_categories_page': 'S',
+        'admin_products_page': 'T',
+        'select_categories_page': 'U',
+    }
+    CODES = {code: action for action, code in ACTIONS.items()}
+
+    __DIGITS = string.digits + string.ascii_lowercase
+
+    @classmethod
+    def __base36(cls, value: int) -> str:
+        if value < 0:
+            return '-' + cls.__base36(-value)
+
+        digits = ''
+        while True:
+            value, remainder = divmod(value, 36)
+            digits = cls.__DIGITS[remainder] + digits
+            if not value:
+                return digits
+
+    @classmethod
+    def encode(cls, action: str, *args: int) -> str:
+        """Кодирует действие и его целочисленные аргументы"""
+
+        data = cls.VERSION + cls.ACTIONS[action] + ''.join(
+            cls.SEPARATOR + cls.__base36(int(arg)) for arg in args
+        )
+        if len(data.encode()) > cls.MAX_SIZE:
+            raise ValueError(f'callback data is longer than {cls.MAX_SIZE} bytes: {data}')
+        return data
+
+    @classmethod
+    def decode(cls, data: str) -> Optional[tuple[str, list[int]]]:
+        """
+        Возвращает код действия и аргументы либо None,
+        если данные не в компактном формате текущей версии
+        """
+        if len(data) < 2 or data[0] != cls.VERSION or data[1] not in cls.CODES:
+            return None
+
+        code, _, args = data[1:].partition(cls.SEPARATOR)
+        if len(code) != 1:
+            return None
+
+        try:
+            return code, [int(arg, 36) for arg in args.split(cls.SEPARATOR)] if args else []
+        except ValueError:
+            return None
@@ -1,7 +1,42 @@
+from functools import lru_cache, wraps
 from typing import Optional
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from config import KEYBOARD
-from database import DBManager
+from database import DBManager, CatalogCache, Page
+from .codec import CallbackCodec
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """Готовая разметка, которую нельзя изменить: её экземпляр общий для всех апдейтов"""
+
+    def add(self, *args):
+        raise TypeError('cached markup is immutable')
+
+    row = insert = add
+
+
+def freeze(markup: InlineKeyboardMarkup) -> FrozenInlineKeyboardMarkup:
+    return FrozenInlineKeyboardMarkup(inline_keyboard=markup.inline_keyboard)
+
+
+@lru_cache(maxsize=1024)
+def amount_orders_label(step: int, amount_orders: int) -> str:
+    """Подпись счетчика позиций в заказе"""
+    return f'{step + 1} из {amount_orders}'
+
+
+# ********** DECORATORS **********
+def static_markup(func):
+    """Разметка статического меню строится один раз и затем переиспользуется"""
+    markups = {}
+
+    @wraps(func)
+    def wrapper(self, *args):
+        if args not in markups:
+            markups[args] = freeze(func(self, *args))
+        return markups[args]
+
+    return wrapper
 
 
 class Keyboards:
@@ -9,32 +44,28 @@ class Keyboards:
     Класс Keyboards предназначен для создания и разметки интерфейса бота
     """
 
+    # разметки динамических меню каталога, ключ включает версию каталога
+    __catalog_markups = CatalogCache(maxsize=256, ttl=None)
+
     def __init__(self):
         self.markup: Optional[InlineKeyboardMarkup] = None
         self.DB = DBManager()
 
-    def set_inline_btn(
-            self, name: str, callback: str, step: int = 0, quantity: int = 0,
-            amount_orders: int = None
-    ) -> InlineKeyboardButton:
+    @staticmethod
+    def set_inline_btn(name: str, callback: str, text: str = None) -> InlineKeyboardButton:
         """
-        Создает и возвращает кнопку по входным параметрам
+        Создает и возвращает кнопку по входным параметрам. Подпись кнопки
+        берется из KEYBOARD по имени, динамические подписи (названия
+        категорий и товаров, счетчики) передаются через text и никуда не сохраняются
         """
-        _ = KEYBOARD.update({name: name}) if name not in KEYBOARD.keys()\
-            else KEYBOARD.get(f'{name}')
-
-        match name:
-            case 'AMOUNT_PRODUCT':
-                KEYBOARD.update({'AMOUNT_PRODUCT': f'{quantity}'})
-            case 'AMOUNT_ORDERS':
-                KEYBOARD.update({'AMOUNT_ORDERS': f'{step + 1} из {str(amount_orders)}'})
-
         return InlineKeyboardButton(
-            text=KEYBOARD.get(f'{name}'), callback_data=callback
+            text=text if text is not None else KEYBOARD.get(name, name),
+            callback_data=callback
         )
 
     # ********** Client keyboard **********
 
+    @static_markup
     def start_menu(self) -> InlineKeyboardMarkup:
         """Создает разметку кнопок в основном меню и возвращает разметку"""
 
@@ -49,27 +80,59 @@ class Keyboards:
 
         return self.markup
 
+    @static_markup
     def back(self) -> InlineKeyboardMarkup:
         """Создает разметку кнопки для возвращения"""
         self.markup = InlineKeyboardMarkup()
         return self.markup.row(self.set_inline_btn('<<', callback='back'))
 
-    def category_menu(self, *categories, role: str = None, action: str = None) -> InlineKeyboardMarkup:
+    def __memoized(self, key: tuple, build) -> InlineKeyboardMarkup:
+        """Возвращает разметку меню каталога, построенную для текущей версии каталога"""
+        key = (self.DB.catalog_version, *key)
+        markup = self.__catalog_markups.get(key)
+        if markup is None:
+            markup = freeze(build())
+            self.__catalog_markups.set(key, markup)
+        return markup
+
+    def __page_buttons(self, page: Page, action: str, *args: int) -> None:
+        """Добавляет кнопки листания страниц, курсоры передаются в callback data"""
+
+        buttons = [
+            self.set_inline_btn(name, callback=CallbackCodec.encode(action, *args, cursor))
+            for name, cursor in (('PREV_PAGE', page.prev), ('NEXT_PAGE', page.next))
+            if cursor is not None
+        ]
+        if buttons:
+            self.markup.row(*buttons)
+
+    def category_menu(self, page: Page, role: str = None, action: str = None) -> InlineKeyboardMarkup:
         """Создает разметку кнопок в меню категорий товара и возвращает разметку"""
 
+        return self.__memoized(
+            ('category_menu', role, action, page.prev, page.next,
+             tuple((category.id, category.product_count) for category in page.items)),
+            lambda: self.__category_menu(page, role=role, action=action)
+        )
+
+    def __category_menu(self, page: Page, role: str = None, action: str = None) -> InlineKeyboardMarkup:
         self.markup = InlineKeyboardMarkup()
         callback = 'back_to_admin' if action is None else 'cancel_add_product'
         callback_cat = 'select_cat' if role is None else 'only_cat'
 
-        for category in categories:
+        for category in page.items:
             self.markup.add(self.set_inline_btn(
-                category.name,
-                callback=f'{callback_cat}_{category.name}_{category.id}'))
+                'CATEGORY', callback=CallbackCodec.encode(callback_cat, category.id),
+                text=category.name if role is None
+                else f'{category.name} ({category.product_count})'))
 
         if role is None:
+            self.__page_buttons(page, 'categories_page')
             self.markup.row(self.set_inline_btn('<<', callback='back'),
                             self.set_inline_btn('ORDER', callback='order'))
         else:
+            self.__page_buttons(page, 'admin_categories_page' if action is None
+                              else 'select_categories_page')
             self.markup.row(self.set_inline_btn('<<', callback=callback))
 
         return self.markup
@@ -80,16 +143,18 @@ class Keyboards:
         """
 
         self.markup = InlineKeyboardMarkup()
-        itm_btn_1 = self.set_inline_btn('X', 'remove', step, quantity)
-        itm_btn_2 = self.set_inline_btn('DOWN', 'down', step, quantity)
-        itm_btn_3 = self.set_inline_btn('AMOUNT_PRODUCT', 'amount_product', step, quantity)
-        itm_btn_4 = self.set_inline_btn('UP', 'up', step, quantity)
-
-        itm_btn_5 = self.set_inline_btn('BACK_STEP', 'back_step', step, quantity)
-        itm_btn_6 = self.set_inline_btn('AMOUNT_ORDERS', 'amount_orders', step, quantity, amount_orders)
-        itm_btn_7 = self.set_inline_btn('NEXT_STEP', 'next_step', step, quantity)
-        itm_btn_8 = self.set_inline_btn('APPLY', 'apply', step, quantity)
-        itm_btn_9 = self.set_inline_btn('<<', 'back', step, quantity)
+        # позиция курсора передается в callback data, а не хранится на сервере
+        itm_btn_1 = self.set_inline_btn('X', CallbackCodec.encode('remove', step))
+        itm_btn_2 = self.set_inline_btn('DOWN', CallbackCodec.encode('down', step))
+        itm_btn_3 = self.set_inline_btn('AMOUNT_PRODUCT', 'amount_product', text=str(quantity))
+        itm_btn_4 = self.set_inline_btn('UP', CallbackCodec.encode('up', step))
+
+        itm_btn_5 = self.set_inline_btn('BACK_STEP', CallbackCodec.encode('back_step', step))
+        itm_btn_6 = self.set_inline_btn('AMOUNT_ORDERS', 'amount_orders',
+                                        text=amount_orders_label(step, amount_orders))
+        itm_btn_7 = self.set_inline_btn('NEXT_STEP', CallbackCodec.encode('next_step', step))
+        itm_btn_8 = self.set_inline_btn('APPLY', 'apply')
+        itm_btn_9 = self.set_inline_btn('<<', 'back')
         # рассположение кнопок в меню
         self.markup.row(itm_btn_1, itm_btn_2, itm_btn_3, itm_btn_4)
         self.markup.row(itm_btn_5, itm_btn_6, itm_btn_7)
@@ -97,6 +162,7 @@ class Keyboards:
 
         return self.markup
 
+    @static_markup
     def payments_menu(self) -> InlineKeyboardMarkup:
         """
         Создает разметку кнопок для выбора оплаты заказа и возвращает разметку
@@ -110,25 +176,42 @@ class Keyboards:
 
         return self.markup
 
-    def view_all_products(self, *products, role: str = None) -> InlineKeyboardMarkup:
-        """Создает разметку кнопок для вывода всех товаров и возвращает её"""
+    def view_all_products(self, page: Page, category_id: int, role: str = None) -> InlineKeyboardMarkup:
+        """Создает разметку кнопок для вывода страницы товаров категории и возвращает её"""
+
+        return self.__memoized(
+            ('view_all_products', role, category_id, page.prev, page.next,
+             tuple(product.id for product in page.items)),
+            lambda: self.__view_all_products(page, category_id, role=role)
+        )
 
+    def __view_all_products(self, page: Page, category_id: int, role: str = None) -> InlineKeyboardMarkup:
         self.markup = InlineKeyboardMarkup()
 
         call_product = 'client_product' if role == 'client' else 'product'
-        for product in products:
-            if product.quantity > 0:
-                self.markup.add(self.set_inline_btn(
-                    product.name, callback=f'{call_product}_{product.name}_{product.id}'))
+        for product in page.items:
+            self.markup.add(self.set_inline_btn(
+                'PRODUCT', callback=CallbackCodec.encode(call_product, product.id),
+                text=product.name))
 
         match role:
             case 'client':
+                self.__page_buttons(page, 'products_page', category_id)
                 self.markup.row(self.set_inline_btn('<<', callback='back'))
             case 'admin':
+                self.__page_buttons(page, 'admin_products_page', category_id)
                 self.markup.row(self.set_inline_btn('<<', callback='list_category'))
 
         return self.markup
 
+    def search_result(self, product_id: int) -> InlineKeyboardMarkup:
+        """Создает кнопку добавления в заказ товара из результатов inline-поиска"""
+
+        self.markup = InlineKeyboardMarkup()
+        return self.markup.add(self.set_inline_btn(
+            'ADD_TO_ORDER', callback=CallbackCodec.encode('client_product', product_id)))
+
+    @static_markup
     def back_main_menu(self) -> InlineKeyboardMarkup:
         """Создает кнопку для возврата в главное меню"""
 
@@ -139,6 +222,7 @@ class Keyboards:
         return self.markup
 
     # ********** Admin keyboard **********
+    @static_markup
     def start_admin_menu(self) -> InlineKeyboardMarkup:
         """Создает разметку кнопок для админа"""
 
@@ -151,6 +235,10 @@ class Keyboards:
             self.set_inline_btn('ADD_PRODUCT', callback='add_product'),
             self.set_inline_btn('LIST_PRODUCT', callback='list_product'),
         )
+        self.markup.row(
+            self.set_inline_btn('IMPORT_CATALOG', callback='import_catalog'),
+            self.set_inline_btn('EXPORT_CATALOG', callback='export_catalog'),
+        )
         self.markup.row(self.set_inline_btn('<<', callback='back'))
 
         return self.markup
@@ -174,7 +262,7 @@ class Keyboards:
         """Создает разметки кнопок для подменю категории"""
 
         return self.set_view_only_item(
-            value_btn='DELETE_CATEGORY', callback_id=f'delete_category_{category_id}',
+            value_btn='DELETE_CATEGORY', callback_id=CallbackCodec.encode('delete_category', category_id),
             callback_back='back_to_category_list', value_btn_back='<<'
         )
 
@@ -182,10 +270,11 @@ class Keyboards:
         """Создает разметки кнопок для подменю товара"""
 
         return self.set_view_only_item(
-            value_btn='DELETE_PRODUCT', callback_id=f'delete_product_{product_id}',
+            value_btn='DELETE_PRODUCT', callback_id=CallbackCodec.encode('delete_product', product_id),
             callback_back='back_to_product_list', value_btn_back='<<'
         )
 
+    @static_markup
     def preview_product(self) -> InlineKeyboardMarkup:
         """Создает разметки кнопок для сохранения/отмены в бд продукта"""
 
@@ -196,6 +285,7 @@ class Keyboards:
         )
         return self.markup
 
+    @static_markup
     def cancel_inline_btn(self, action: str = None) -> InlineKeyboardMarkup:
         """Создает разметку кнопки для отмены"""
 
@@ -0,0 +1,2 @@
+from .unit_of_work import UnitOfWorkMiddleware
+from .throttling import ThrottlingMiddleware
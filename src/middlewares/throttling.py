@@ -0,0 +1,119 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Optional, Union
+
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, Update
+from config import MESSAGES
+
+# причины, по которым апдейт отклонен
+REJECT_RATE = 'rate'
+REJECT_DUPLICATE = 'duplicate'
+
+
+class SlidingWindow:
+    """
+    Счетчик апдейтов пользователя в скользящем окне: хранит только
+    число апдейтов в текущем и предыдущем окне, количество за последние
+    window секунд оценивается по их взвешенной сумме
+    """
+
+    __slots__ = ('start', 'previous', 'current')
+
+    def __init__(self, now: float):
+        self.start = now
+        self.previous = 0
+        self.current = 0
+
+    def hit(self, now: float, window: float, limit: int) -> bool:
+        """Учитывает апдейт, False - лимит в окне превышен"""
+        elapsed = now - self.start
+        if elapsed >= window:
+            # окно сдвинулось: текущее стало предыдущим (или оба устарели)
+            self.previous = self.current if elapsed < 2 * window else 0
+            self.current = 0
+            self.start = now - elapsed % window
+            elapsed = now - self.start
+
+        if self.previous * (1 - elapsed / window) + self.current >= limit:
+            return False
+        self.current += 1
+        return True
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту сообщений и callback от одного пользователя:
+    не больше rate апдейтов за window секунд, лишние отклоняются
+    до вызова обработчиков. Callback из single_flight (например,
+    оформление заказа 'post') не обрабатываются повторно, пока
+    не завершена обработка предыдущего нажатия того же пользователя.
+    Счетчики отклоненных апдейтов - в rejected
+    """
+
+    def __init__(self, rate: int, window: float, single_flight: tuple = (),
+                 max_users: int = 10000):
+        super().__init__()
+        self.rate = rate
+        self.window = window
+        self.single_flight = frozenset(single_flight)
+        self.max_users = max_users
+        self.rejected = Counter()
+        self.__windows: OrderedDict[int, SlidingWindow] = OrderedDict()
+        self.__in_flight: set[tuple[int, str]] = set()
+
+    # ********** RATE LIMIT **********
+
+    def __allow(self, user_id: int) -> bool:
+        now = time.monotonic()
+        window = self.__windows.get(user_id)
+        if window is None:
+            window = self.__windows[user_id] = SlidingWindow(now)
+            if len(self.__windows) > self.max_users:
+                # забываем пользователя, который дольше всех не присылал апдейтов
+                self.__windows.popitem(last=False)
+        else:
+            self.__windows.move_to_end(user_id)
+        return window.hit(now, self.window, self.rate)
+
+    async def __reject(self, event: Union[Message, CallbackQuery], reason: str) -> None:
+        self.rejected[reason] += 1
+        logging.debug(f'Update from user {event.from_user.id} rejected: {reason}')
+        if isinstance(event, CallbackQuery):
+            # убираем часики на кнопке
+            await event.answer(MESSAGES.get('too_many_requests'))
+        raise CancelHandler()
+
+    async def on_pre_process_message(self, message: Message, data: dict) -> None:
+        if message.from_user is not None and not self.__allow(message.from_user.id):
+            await self.__reject(message, REJECT_RATE)
+
+    async def on_pre_process_callback_query(self, callback: CallbackQuery, data: dict) -> None:
+        if not self.__allow(callback.from_user.id):
+            await self.__reject(callback, REJECT_RATE)
+
+        key = self.__flight_key(callback)
+        if key is not None:
+            if key in self.__in_flight:
+                await self.__reject(callback, REJECT_DUPLICATE)
+            self.__in_flight.add(key)
+
+    # ********** SINGLE FLIGHT **********
+
+    def __flight_key(self, callback: Optional[CallbackQuery]) -> Optional[tuple[int, str]]:
+        if callback is None or callback.data not in self.single_flight:
+            return None
+        return callback.from_user.id, callback.data
+
+    async def on_post_process_callback_query(self, callback: CallbackQuery,
+                                             results: list, data: dict) -> None:
+        key = self.__flight_key(callback)
+        if key is not None:
+            self.__in_flight.discard(key)
+
+    async def on_pre_process_error(self, update: Update, exception: Exception, data: dict) -> None:
+        key = self.__flight_key(update.callback_query)
+        if key is not None:
+            self.__in_flight.discard(key)
@@ -0,0 +1,26 @@
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.types import Update
+from database import DBEngine, UnitOfWork, current_unit_of_work
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """
+    Открывает единицу работы на время обработки апдейта:
+    все запросы к бд из обработчиков выполняются в одной транзакции,
+    которая фиксируется после обработки и откатывается при ошибке
+    """
+
+    async def on_pre_process_update(self, update: Update, data: dict) -> None:
+        current_unit_of_work.set(UnitOfWork(DBEngine()))
+
+    async def on_post_process_update(self, update: Update, results: list, data: dict) -> None:
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None:
+            current_unit_of_work.set(None)
+            await unit_of_work.commit()
+
+    async def on_pre_process_error(self, update: Update, exception: Exception, data: dict) -> None:
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None:
+            current_unit_of_work.set(None)
+            await unit_of_work.rollback()
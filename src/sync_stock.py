@@ -0,0 +1,65 @@
+"""
+Синхронизация остатков товаров со складом из файла CSV или XLSX.
+Колонки: id (или name) и quantity - количество товара на складе.
+
+    python sync_stock.py stock.csv
+    python sync_stock.py stock.xlsx --dry-run --report diff.csv
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import sys
+import time
+from config import STOCK_SYNC_BATCH_SIZE
+from database import DBEngine, SyncReport, read_stock, sync_stock
+
+
+async def run(args: argparse.Namespace) -> SyncReport:
+    report = SyncReport()
+    started = time.monotonic()
+
+    async def progress(current: SyncReport) -> None:
+        logging.info(f'Строк: {current.rows}, найдено товаров: {current.found}, '
+                     f'изменено: {len(current.changes)}')
+
+    try:
+        await sync_stock(read_stock(args.path, report), report, batch_size=args.batch_size,
+                         dry_run=args.dry_run, progress=progress)
+    finally:
+        await DBEngine().dispose()
+
+    logging.info(f'Синхронизация {"(без записи) " if args.dry_run else ""}завершена '
+                 f'за {time.monotonic() - started:.1f} сек: строк {report.rows}, '
+                 f'найдено товаров {report.found}, изменено {len(report.changes)}, '
+                 f'не найдено {len(report.missing)}, с ошибками {report.failed}')
+    for line, product_id, name in report.missing:
+        logging.warning(f'Строка {line}: товар {product_id or name!r} не найден')
+    for line, error in report.errors:
+        logging.warning(f'Строка {line}: {error}')
+
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(('id', 'name', 'old_quantity', 'new_quantity'))
+            writer.writerows(report.changes)
+    return report
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level='INFO',
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description='Синхронизация остатков товаров со складом')
+    parser.add_argument('path', help='файл CSV или XLSX с колонками id (или name) и quantity')
+    parser.add_argument('--dry-run', action='store_true', help='показать изменения без записи')
+    parser.add_argument('--report', help='записать изменения остатков в CSV')
+    parser.add_argument('--batch-size', type=int, default=STOCK_SYNC_BATCH_SIZE)
+
+    try:
+        asyncio.run(run(parser.parse_args()))
+    except ValueError as e:
+        logging.error(f'Не удалось прочитать файл: {e}')
+        sys.exit(1)
@@ -0,0 +1,2 @@
+from .webhook import WebhookServer
+from .throttled_bot import ThrottledBot, TokenBucket
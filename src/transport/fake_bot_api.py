@@ -0,0 +1,104 @@
+"""
+Имитация Bot API Telegram для локальной проверки исходящих запросов бота.
+Сервер отвечает на методы Bot API и, как настоящий Telegram, возвращает
+429 с retry_after при превышении лимитов: rate запросов в секунду на бота
+и одного сообщения в секунду на чат.
+
+    python -m transport.fake_bot_api --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python bot.py
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter, defaultdict, deque
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    """Bot API, который считает запросы и ограничивает их частоту"""
+
+    def __init__(self, rate: int = 30, chat_rate: int = 1, retry_after: int = 1):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.flood = Counter()
+        self.__message_ids = itertools.count(1)
+        self.__window = deque()
+        self.__chat_windows: defaultdict[str, deque] = defaultdict(deque)
+
+    @staticmethod
+    def __hit(window: deque, limit: int, now: float) -> bool:
+        """
+        Учитывает запрос в окне последней секунды (с допуском
+        на задержки сети), False - лимит превышен
+        """
+        while window and window[0] <= now - 0.95:
+            window.popleft()
+        if len(window) >= limit:
+            return False
+        window.append(now)
+        return True
+
+    def __result(self, method: str, data: dict):
+        chat = {'id': int(data.get('chat_id', 0) or 0), 'type': 'private'}
+        message = {'message_id': int(data.get('message_id') or next(self.__message_ids)),
+                   'date': int(time.time()), 'chat': chat, 'text': data.get('text', '')}
+
+        match method:
+            case 'getMe':
+                return {'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'}
+            case 'sendMessage' | 'editMessageText' | 'editMessageReplyMarkup':
+                return True if data.get('inline_message_id') else message
+            case 'getUpdates':
+                return []
+            case _:
+                return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        data = dict(await request.post()) if request.can_read_body else {}
+        if not data:
+            data = dict(request.query)
+        now = time.monotonic()
+
+        if method == 'getUpdates':
+            await asyncio.sleep(min(float(data.get('timeout', 0) or 0), 1))
+        elif not self.__hit(self.__window, self.rate, now) or (
+                'chat_id' in data and method not in ('answerCallbackQuery', 'answerInlineQuery')
+                and not self.__hit(self.__chat_windows[str(data['chat_id'])], self.chat_rate, now)):
+            self.flood[method] += 1
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after}
+            }, status=429)
+
+        self.calls[method] += 1
+        return web.json_response({'ok': True, 'result': self.__result(method, data)})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate', type=int, default=30)
+    parser.add_argument('--chat-rate', type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(rate=args.rate, chat_rate=args.chat_rate)
+    try:
+        web.run_app(api.make_app(), host=args.host, port=args.port)
+    finally:
+        print(f'calls: {dict(api.calls)}, flood: {dict(api.flood)}')
+
+
+if __name__ == '__main__':
+    main()
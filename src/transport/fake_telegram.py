@@ -0,0 +1,83 @@
+"""
+Имитация Telegram для локальной проверки webhook-режима:
+отправляет на сервер бота пачки апдейтов и выводит статистику ответов.
+
+    python -m transport.fake_telegram --url http://127.0.0.1:8080/webhook --updates 500
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import ClientSession
+
+from transport.webhook import SECRET_HEADER
+
+CALLBACKS = ('info', 'settings', 'back', 'choose_goods', 'order')
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    """Создает апдейт с нажатием inline-кнопки либо командой /start"""
+
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'rep{user_id}'}
+    chat = {'id': user_id, 'type': 'private'}
+    message = {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'from': user}
+
+    if update_id % len(CALLBACKS) == 0:
+        return {'update_id': update_id, 'message': {**message, 'text': '/start',
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}]}}
+
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id), 'from': user, 'chat_instance': str(user_id),
+            'message': {**message, 'text': 'menu'},
+            'data': CALLBACKS[update_id % len(CALLBACKS)],
+        }
+    }
+
+
+async def post_updates(url: str, updates: int, batch: int, users: int,
+                       concurrency: int, secret: Optional[str]) -> Counter:
+    statuses = Counter()
+    ids = itertools.count(1)
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    async def sender(session: ClientSession, batches: int) -> None:
+        for _ in range(batches):
+            payload = [make_update(update_id, update_id % users + 1)
+                       for update_id in itertools.islice(ids, batch)]
+            async with session.post(url, json=payload if batch > 1 else payload[0],
+                                    headers=headers) as response:
+                statuses[response.status] += 1
+
+    async with ClientSession() as session:
+        batches = max(updates // batch // concurrency, 1)
+        await asyncio.gather(*(sender(session, batches) for _ in range(concurrency)))
+
+    return statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fake Telegram webhook client')
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--updates', type=int, default=100)
+    parser.add_argument('--batch', type=int, default=1)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--secret', default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    statuses = asyncio.run(post_updates(
+        args.url, args.updates, args.batch, args.users, args.concurrency, args.secret
+    ))
+    elapsed = time.perf_counter() - started
+
+    print(f'requests: {sum(statuses.values())} in {elapsed:.2f}s, statuses: {dict(statuses)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+# приоритеты исходящих запросов: меньше - раньше
+PRIORITY_ANSWER = 0
+PRIORITY_EDIT = 1
+PRIORITY_SEND = 2
+
+ANSWER_METHODS = frozenset({'answerCallbackQuery', 'answerInlineQuery'})
+EDIT_METHODS = frozenset({'editMessageText', 'editMessageReplyMarkup',
+                          'editMessageCaption', 'editMessageMedia'})
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until', 'lock')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # время, до которого Telegram попросил не отправлять запросы (retry_after)
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до следующего токена"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def refund(self) -> None:
+        """Возвращает неиспользованный токен"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def restart(self) -> None:
+        """
+        Отсчитывает следующий токен от фактической отправки запроса,
+        а не от момента, когда токен был получен
+        """
+        self.delay()
+        self.tokens = min(self.tokens, self.capacity - 1)
+        self.updated = time.monotonic()
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """Дожидается токена, запросы одного чата обслуживаются по очереди"""
+        async with self.lock:
+            while (delay := self.delay()) > 0:
+                await asyncio.sleep(delay)
+            self.take()
+
+
+class ThrottledBot(Bot):
+    """
+    Bot с управлением потоком исходящих запросов к Bot API.
+
+    Запросы в чат проходят через корзину токенов чата (личные чаты
+    и группы с разными лимитами) и общую корзину бота. Общие токены
+    выдаются по приоритету: ответы на callback и inline-запросы,
+    затем редактирование сообщений, затем остальное. Если Telegram
+    отвечает 429, чат (или весь бот) блокируется на retry_after и запрос
+    повторяется. Редактирование, которое ещё ждет отправки, отменяется
+    более новым редактированием того же сообщения: оно возвращает True,
+    как будто сообщение уже изменено
+    """
+
+    def __init__(self, token: str, rate: float = 30, chat_rate: float = 1,
+                 group_rate: float = 20 / 60, max_retries: int = 3,
+                 max_chats: int = 10000, **kwargs):
+        super().__init__(token, **kwargs)
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_chats = max_chats
+
+        # без накопления токенов: в любом окне в 1 секунду не больше rate запросов
+        self.__global = TokenBucket(rate, 1)
+        self.__chats: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.__waiters: list = []
+        self.__sequence = itertools.count()
+        self.__wakeup = asyncio.Event()
+        self.__pump: Optional[asyncio.Task] = None
+        self.__edits: Dict[tuple, int] = {}
+
+    # ********** BUCKETS **********
+
+    def __chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self.__chats.get(key)
+        if bucket is None:
+            # в группах Telegram допускает меньше сообщений, чем в личных чатах
+            rate = self.group_rate if key.startswith('-') or key.startswith('@') else self.chat_rate
+            bucket = self.__chats[key] = TokenBucket(rate, 1)
+
+            # забываем давно не используемые чаты, у которых нет ожидающих запросов
+            for old_key in list(itertools.islice(self.__chats, max(len(self.__chats) - self.max_chats, 0))):
+                if not self.__chats[old_key].lock.locked():
+                    del self.__chats[old_key]
+
+        self.__chats.move_to_end(key)
+        return bucket
+
+    async def __global_token(self, priority: int) -> None:
+        """Ждет общего токена в очереди с приоритетом"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.__waiters, (priority, next(self.__sequence), future))
+
+        if self.__pump is None or self.__pump.done():
+            self.__pump = asyncio.create_task(self.__pump_tokens())
+        self.__wakeup.set()
+
+        await future
+
+    async def __pump_tokens(self) -> None:
+        while True:
+            if not self.__waiters:
+                self.__wakeup.clear()
+                await self.__wakeup.wait()
+                continue
+
+            delay = self.__global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self.__waiters)
+            if not future.done():
+                self.__global.take()
+                future.set_result(None)
+
+    # ********** REQUESTS **********
+
+    @staticmethod
+    def __priority(method: str) -> int:
+        """Приоритет запроса в очереди за общим токеном"""
+        if method in ANSWER_METHODS:
+            return PRIORITY_ANSWER
+        if method in EDIT_METHODS:
+            return PRIORITY_EDIT
+        return PRIORITY_SEND
+
+    @staticmethod
+    def __edit_key(method: str, data: dict) -> Optional[tuple]:
+        if method not in EDIT_METHODS:
+            return None
+        if data.get('inline_message_id'):
+            return method, data['inline_message_id']
+        return method, str(data.get('chat_id')), data.get('message_id')
+
+    async def request(self, method: str, data: Optional[Dict] = None,
+                      files: Optional[Dict] = None, **kwargs):
+        data = data or {}
+        chat_id = data.get('chat_id')
+
+        # служебные запросы (getUpdates, getMe, setWebhook...) не ограничиваются
+        if chat_id is None and method not in ANSWER_METHODS and method not in EDIT_METHODS:
+            return await super().request(method, data, files, **kwargs)
+
+        edit_key = self.__edit_key(method, data)
+        if edit_key is not None:
+            edit_id = self.__edits[edit_key] = next(self.__sequence)
+
+        try:
+            for attempt in itertools.count():
+                bucket = self.__chat_bucket(chat_id) if chat_id is not None else None
+                if bucket is not None:
+                    await bucket.acquire()
+
+                if edit_key is not None and self.__edits.get(edit_key) != edit_id:
+                    # сообщение уже изменит более новое редактирование
+                    if bucket is not None:
+                        bucket.refund()
+                    return True
+
+                await self.__global_token(self.__priority(method))
+                if bucket is not None:
+                    bucket.restart()
+
+                try:
+                    return await super().request(method, data, files, **kwargs)
+                except RetryAfter as e:
+                    logging.warning(f'{method} to chat {chat_id} hit flood control, '
+                                    f'retry in {e.timeout}s')
+                    (bucket or self.__global).block(e.timeout)
+                    if attempt >= self.max_retries:
+                        raise
+        finally:
+            if edit_key is not None and self.__edits.get(edit_key) == edit_id:
+                del self.__edits[edit_key]
+
+    async def shutdown(self) -> None:
+        """Останавливает выдачу токенов (сессию закрывает aiogram)"""
+        if self.__pump is not None:
+            self.__pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.__pump
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """
+    Сервер aiohttp, принимающий апдейты Telegram через webhook.
+
+    Принятые апдейты складываются в ограниченную очередь и обрабатываются
+    пулом из workers воркеров. Если очередь заполнена, сервер отвечает 429,
+    и Telegram повторит доставку позже. При остановке сервер перестает
+    принимать апдейты и дожидается обработки очереди (не дольше drain_timeout)
+    """
+
+    def __init__(self, dp: Dispatcher, path: str = '/webhook', secret: Optional[str] = None,
+                 workers: int = 16, queue_size: int = 1000, drain_timeout: float = 30):
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.__queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self.__workers: list[asyncio.Task] = []
+        self.__closing = False
+
+    # ********** RECEIVING UPDATES **********
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Принимает один апдейт либо список апдейтов"""
+
+        if self.__closing:
+            return web.Response(status=503)
+
+        if self.secret is not None and request.headers.get(SECRET_HEADER) != self.secret:
+            return web.Response(status=401)
+
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        updates = payload if isinstance(payload, list) else [payload]
+
+        # обратное давление: апдейт не принимается, пока для него нет места
+        if self.__queue.maxsize - self.__queue.qsize() < len(updates):
+            return web.Response(status=429, headers={'Retry-After': '1'})
+
+        for update in updates:
+            self.__queue.put_nowait(Update(**update))
+
+        return web.Response(status=200)
+
+    # ********** PROCESSING UPDATES **********
+
+    async def __worker(self) -> None:
+        Bot.set_current(self.dp.bot)
+        Dispatcher.set_current(self.dp)
+
+        while True:
+            update = await self.__queue.get()
+            try:
+                await self.dp.process_updates([update])
+            except Exception as e:
+                logging.exception(f'failed to process update {update.update_id}: {e}')
+            finally:
+                self.__queue.task_done()
+
+    async def start_workers(self) -> None:
+        self.__closing = False
+        self.__workers = [asyncio.create_task(self.__worker()) for _ in range(self.workers)]
+
+    async def drain(self) -> None:
+        """Перестает принимать апдейты и дожидается обработки очереди"""
+
+        self.__closing = True
+        try:
+            await asyncio.wait_for(self.__queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f'webhook drain timed out, {self.__queue.qsize()} updates dropped')
+
+        for worker in self.__workers:
+            worker.cancel()
+        for worker in self.__workers:
+            with suppress(asyncio.CancelledError):
+                await worker
+        self.__workers = []
+
+    # ********** APPLICATION **********
+
+    def make_app(self, on_startup: Callable[[Dispatcher], Awaitable] = None,
+                 on_shutdown: Callable[[Dispatcher], Awaitable] = None) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+
+        async def startup(_):
+            await self.start_workers()
+            if on_startup is not None:
+                await on_startup(self.dp)
+
+        async def shutdown(_):
+            await self.drain()
+            if on_shutdown is not None:
+                await on_shutdown(self.dp)
+            await self.dp.storage.close()
+            await self.dp.storage.wait_closed()
+            session = await self.dp.bot.get_session()
+            await session.close()
+
+        app.on_startup.append(startup)
+        app.on_shutdown.append(shutdown)
+        return app
+
+    def run(self, host: str, port: int, on_startup: Callable[[Dispatcher], Awaitable] = None,
+            on_shutdown: Callable[[Dispatcher], Awaitable] = None) -> None:
+        web.run_app(self.make_app(on_startup, on_shutdown), host=host, port=port)